@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def synchronous_background_work(settings):
+    """Фоновые задачи выполняются сразу после фиксации транзакции.
+
+    Тесты удаляют временный MEDIA_ROOT и очищают базу в конце, и фоновые
+    потоки не должны писать превью и уведомления после этого.
+    """
+    settings.THUMBNAIL_ASYNC = False
+    settings.NOTIFICATIONS_ASYNC = False
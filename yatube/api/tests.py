@@ -0,0 +1,217 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import archive
+from posts.models import Comment, Follow, Group, GroupSubscription, Post
+
+NUMBER_OF_POSTS_DISPLAYED = settings.NUMBER_OF_POSTS_DISPLAYED
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='Author', first_name='Лев', last_name='Толстой'
+        )
+        self.user = User.objects.create_user(username='User')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}', group=self.group)
+            for number in range(NUMBER_OF_POSTS_DISPLAYED + 2)
+        )
+        self.post = Post.objects.create(
+            author=self.author, text='Последний пост', group=self.group
+        )
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_resources_available(self):
+        """Ресурсы API отдают JSON"""
+        urls = (
+            reverse('api:post_list'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+            reverse('api:post_detail', args=[self.post.pk]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+
+    def test_missing_resources(self):
+        """Несуществующие объекты дают 404"""
+        urls = (
+            reverse('api:group_posts', args=['missing']),
+            reverse('api:profile', args=['missing']),
+            reverse('api:post_detail', args=[self.post.pk + 100]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_post_list_pages(self):
+        """Список постов листается курсором"""
+        data = self.client.get(reverse('api:post_list')).json()
+        self.assertEqual(len(data['results']), NUMBER_OF_POSTS_DISPLAYED)
+        first = data['results'][0]
+        self.assertEqual(first['id'], self.post.pk)
+        self.assertEqual(first['author_username'], 'Author')
+        self.assertEqual(first['author_first_name'], 'Лев')
+        self.assertEqual(first['group_slug'], 'group')
+        self.assertIsNone(first['image'])
+        self.assertIsNone(data['previous'])
+        data = self.client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 3)
+        self.assertIsNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+
+    def test_post_detail(self):
+        """Пост отдаётся вместе с комментариями"""
+        data = self.client.get(
+            reverse('api:post_detail', args=[self.post.pk])
+        ).json()
+        self.assertEqual(data['post']['text'], 'Последний пост')
+        self.assertEqual(data['post']['comments_count'], 1)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['Комментарий']
+        )
+
+    def test_archived_posts(self):
+        """Архивные посты доступны в профиле и по прежнему адресу"""
+        archive.archive(timezone.now() + timedelta(days=1))
+        data = self.client.get(
+            reverse('api:post_detail', args=[self.post.pk])
+        ).json()
+        self.assertEqual(data['post']['text'], 'Последний пост')
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']['results']],
+            ['Комментарий']
+        )
+        data = self.client.get(
+            reverse('api:profile', args=[self.author.username])
+        ).json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+        data = self.client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 3)
+
+    def test_not_modified(self):
+        """Неизменившаяся страница отдаёт 304 без запросов к постам"""
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_changes_with_data(self):
+        """Изменение данных меняет ETag"""
+        urls = (
+            reverse('api:post_list'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        Post.objects.create(
+            author=self.author, text='Новый пост', group=self.group
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+        url = reverse('api:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Ещё комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_follow_requires_login(self):
+        """Лента подписок требует авторизации"""
+        url = reverse('api:follow_index')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        Follow.objects.create(user=self.user, author=self.author)
+        data = self.authorized_client.get(url).json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+
+    def test_follow_merges_group_subscriptions(self):
+        """Лента с подпиской на автора и его группу листается без повторов"""
+        Follow.objects.create(user=self.user, author=self.author)
+        GroupSubscription.objects.create(user=self.user, group=self.group)
+        url = reverse('api:follow_index')
+        ids = []
+        while url:
+            data = self.authorized_client.get(url).json()
+            ids.extend(row['id'] for row in data['results'])
+            url = data['next']
+        self.assertEqual(ids, list(Post.objects.values_list('id', flat=True)))
+
+    def test_read_only(self):
+        """API принимает только GET"""
+        response = self.authorized_client.post(reverse('api:post_list'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
+
+    def test_batch_permissions(self):
+        """Пакетная загрузка доступна только сотрудникам"""
+        url = reverse('api:batch')
+        response = self.client.post(url, {}, content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        response = self.authorized_client.post(
+            url, {}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_batch(self):
+        """Пакет сохраняется целиком или не сохраняется вовсе"""
+        self.user.is_staff = True
+        self.user.save()
+        url = reverse('api:batch')
+        posts_count = Post.objects.count()
+        response = self.authorized_client.post(url, {
+            'posts': [{'author': 'Author', 'text': 'Из пакета'}],
+            'comments': [{'author': 'User', 'post': 0, 'text': 'Текст'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('0', response.json()['errors']['comments'])
+        self.assertEqual(Post.objects.count(), posts_count)
+        response = self.authorized_client.post(url, {
+            'posts': [{'author': 'Author', 'text': 'Из пакета'}],
+            'comments': [
+                {'author': 'User', 'post': self.post.pk, 'text': 'Текст'}
+            ],
+            'follows': [{'user': 'User', 'author': 'Author'}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        data = response.json()
+        self.assertTrue(Post.objects.filter(
+            pk=data['posts'][0], text='Из пакета'
+        ).exists())
+        self.assertEqual(len(data['comments']), 1)
+        self.assertTrue(
+            Follow.objects.filter(user=self.user, author=self.author).exists()
+        )
+        response = self.authorized_client.post(
+            url, 'не json', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
@@ -0,0 +1,227 @@
+"""JSON API только для чтения: те же данные, что и HTML-страницы posts.
+
+Ответы собираются из queryset.values() без создания объектов моделей.
+ETag и Last-Modified строятся по версиям из posts.caching, поэтому
+неизменившаяся страница отдаёт 304 без запросов к спискам постов.
+В ответы попадают только поля, при изменении которых меняется версия.
+"""
+import hashlib
+import json
+from http import HTTPStatus
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import (condition, require_GET,
+                                          require_POST)
+
+from posts import caching, services
+from posts.feed import get_feed
+from posts.models import (ArchivedComment, ArchivedPost, Comment, Group,
+                          Post, User)
+from posts.utils import MergedQuerySet, get_cursor_page
+
+POST_FIELDS = {
+    'author_username': F('author__username'),
+    'author_first_name': F('author__first_name'),
+    'author_last_name': F('author__last_name'),
+    'group_slug': F('group__slug'),
+    'group_title': F('group__title'),
+}
+COMMENT_FIELDS = {
+    'author_username': F('author__username'),
+    'author_first_name': F('author__first_name'),
+    'author_last_name': F('author__last_name'),
+}
+
+
+def _post_values(queryset, *fields):
+    return queryset.values(
+        'id', 'text', 'created', 'image', *fields, **POST_FIELDS
+    )
+
+
+def _serialize_post(row):
+    image = row.pop('image')
+    row['image'] = default_storage.url(image) if image else None
+    return row
+
+
+def _page(request, queryset, serialize=dict):
+    """Страница курсорной пагинации в виде словаря для JSON."""
+    page = get_cursor_page(queryset, request.GET.get('cursor'))
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        return request.build_absolute_uri(f'{request.path}?cursor={cursor}')
+
+    return {
+        'results': [serialize(row) for row in page],
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+    }
+
+
+def _conditional(namespaces):
+    """Заголовки ETag и Last-Modified по версиям пространств имён."""
+
+    def etag(request, *args, **kwargs):
+        version = caching.get_version(*namespaces(*args, **kwargs))
+        key = f'{version}:{request.get_full_path()}'
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        return caching.version_time(
+            caching.get_version(*namespaces(*args, **kwargs))
+        )
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def _group_namespaces(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    return caching.group(group_id), caching.GROUPS, caching.AUTHORS
+
+
+def _profile_namespaces(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    return caching.profile(author_id), caching.GROUPS, caching.AUTHORS
+
+
+@require_GET
+@_conditional(lambda: (caching.INDEX, caching.GROUPS, caching.AUTHORS))
+def post_list(request):
+    posts = _post_values(Post.objects.all())
+    return JsonResponse(_page(request, posts, _serialize_post))
+
+
+@require_GET
+@_conditional(_group_namespaces)
+def group_posts(request, slug):
+    group = get_object_or_404(
+        Group.objects.values('id', 'title', 'slug', 'description'),
+        slug=slug
+    )
+    posts = _post_values(Post.objects.filter(group_id=group['id']))
+    return JsonResponse({
+        'group': group,
+        **_page(request, posts, _serialize_post)
+    })
+
+
+@require_GET
+@_conditional(_profile_namespaces)
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.values(
+            'id', 'username', 'first_name', 'last_name',
+            posts_count=F('counters__posts'),
+        ),
+        username=username
+    )
+    # Как и на HTML-странице, архивные посты остаются в профиле автора
+    posts = MergedQuerySet(
+        _post_values(Post.objects.filter(author_id=author['id'])),
+        _post_values(ArchivedPost.objects.filter(author_id=author['id']))
+    )
+    return JsonResponse({
+        'author': author,
+        **_page(request, posts, _serialize_post)
+    })
+
+
+@require_GET
+@_conditional(
+    lambda post_id: (caching.post(post_id), caching.GROUPS, caching.AUTHORS)
+)
+def post_detail(request, post_id):
+    post = _post_values(Post.objects.all(), 'comments_count').filter(
+        pk=post_id
+    ).first()
+    comment_model = Comment
+    if post is None:
+        post = get_object_or_404(
+            _post_values(ArchivedPost.objects.all(), 'comments_count'),
+            pk=post_id
+        )
+        comment_model = ArchivedComment
+    comments = comment_model.objects.filter(post_id=post_id).values(
+        'id', 'text', 'created', **COMMENT_FIELDS
+    )
+    return JsonResponse({
+        'post': _serialize_post(post),
+        'comments': _page(request, comments),
+    })
+
+
+def _unauthorized():
+    return JsonResponse(
+        {'detail': 'Требуется авторизация'},
+        status=HTTPStatus.UNAUTHORIZED
+    )
+
+
+@require_GET
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    posts = _post_values(get_feed(request.user))
+    return JsonResponse(_page(request, posts, _serialize_post))
+
+
+# Разделы пакетной загрузки в порядке сохранения
+BATCH_SECTIONS = (
+    ('posts', services.prepare_posts, services.save_posts),
+    ('comments', services.prepare_comments, services.save_comments),
+    ('follows', services.prepare_follows, services.save_follows),
+)
+
+
+@require_POST
+def batch(request):
+    """Пакетная загрузка постов, комментариев и подписок для сотрудников.
+
+    Тело запроса: {"posts": [...], "comments": [...], "follows": [...]}.
+    Если хоть одна запись не прошла проверку, ничего не сохраняется.
+    """
+    if not request.user.is_authenticated:
+        return _unauthorized()
+    if not request.user.is_staff:
+        return JsonResponse(
+            {'detail': 'Недостаточно прав'}, status=HTTPStatus.FORBIDDEN
+        )
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not all(
+        isinstance(data.get(name, []), list)
+        and all(isinstance(item, dict) for item in data.get(name, []))
+        for name, _, _ in BATCH_SECTIONS
+    ):
+        return JsonResponse(
+            {'detail': 'Ожидается объект со списками записей'},
+            status=HTTPStatus.BAD_REQUEST
+        )
+    prepared, errors = {}, {}
+    for name, prepare, _ in BATCH_SECTIONS:
+        prepared[name], section_errors = prepare(data.get(name, []))
+        if section_errors:
+            errors[name] = section_errors
+    if errors:
+        return JsonResponse(
+            {'errors': errors}, status=HTTPStatus.BAD_REQUEST
+        )
+    with transaction.atomic():
+        saved = {
+            name: [obj.pk for obj in save(prepared[name])]
+            for name, _, save in BATCH_SECTIONS
+        }
+    return JsonResponse(saved, status=HTTPStatus.CREATED)
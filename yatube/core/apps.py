@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import sqlite
+        connection_created.connect(
+            sqlite.configure, dispatch_uid='core.sqlite'
+        )
+        if settings.SLOW_QUERY_LOG:
+            from . import slow_queries
+            slow_queries.enable()
@@ -0,0 +1,329 @@
+"""Замеры производительности страниц posts, users и about.
+
+Каждый маршрут из этих приложений прогоняется через тестовый клиент
+Django на текущей базе (обычно заполненной командой generate_data).
+Замер идёт в два прохода: в первом только время ответа, во втором
+количество SQL-запросов и пик выделенной памяти, чтобы инструменты
+не искажали время. Каждый запрос выполняется в транзакции, которая
+откатывается, поэтому изменяющие страницы не меняют данные между
+прогонами.
+"""
+import json
+import math
+import time
+import tracemalloc
+from collections import namedtuple
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Counters, Group, Post, User
+
+# Приложения, все именованные маршруты которых должны быть замерены
+APPS = ('posts', 'users', 'about')
+
+Scenario = namedtuple('Scenario', 'name method url data user')
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Dataset:
+    """Объекты базы, на которых замеряются страницы.
+
+    Берутся самые нагруженные: автор с наибольшим числом постов, группа
+    с наибольшим числом постов, самый обсуждаемый пост и читатель с
+    наибольшим числом подписок.
+    """
+
+    def __init__(self):
+        author = Counters.objects.order_by('-posts').first()
+        reader = Counters.objects.order_by('-following').first()
+        self.group = Group.objects.annotate(
+            total=Count('groups')
+        ).order_by('-total').first()
+        self.post = Post.objects.select_related('author').order_by(
+            '-comments_count'
+        ).first()
+        if not (author and reader and self.group and self.post):
+            raise BenchmarkError(
+                'В базе нет данных, сначала выполните generate_data'
+            )
+        self.author = author.user
+        self.reader = reader.user
+        self.followed = User.objects.filter(
+            following__user=self.reader
+        ).first() or self.author
+        self.not_followed = User.objects.exclude(
+            following__user=self.reader
+        ).exclude(pk=self.reader.pk).first() or self.author
+        self.word = self.post.text.split()[0].strip('.,!?')
+        self.last_page = max(
+            -(-Post.objects.count() // settings.NUMBER_OF_POSTS_DISPLAYED), 1
+        )
+
+
+def get_scenarios(data):
+    """Сценарии замеров по именам маршрутов вида app:name."""
+    author, reader, post = data.author, data.reader, data.post
+    return {
+        'posts:index': [
+            Scenario('posts:index', 'get', reverse('posts:index'), None,
+                     None),
+            Scenario('posts:index?page=last', 'get',
+                     f'{reverse("posts:index")}?page={data.last_page}', None,
+                     None),
+        ],
+        'posts:trending': [
+            Scenario('posts:trending', 'get', reverse('posts:trending'),
+                     None, None),
+        ],
+        'posts:group_list': [
+            Scenario('posts:group_list', 'get',
+                     reverse('posts:group_list', args=[data.group.slug]),
+                     None, None),
+        ],
+        'posts:profile': [
+            Scenario('posts:profile', 'get',
+                     reverse('posts:profile', args=[author.username]),
+                     None, None),
+        ],
+        'posts:post_detail': [
+            Scenario('posts:post_detail', 'get',
+                     reverse('posts:post_detail', args=[post.pk]),
+                     None, None),
+        ],
+        'posts:post_edit': [
+            Scenario('posts:post_edit', 'get',
+                     reverse('posts:post_edit', args=[post.pk]),
+                     None, post.author),
+        ],
+        'posts:post_create': [
+            Scenario('posts:post_create', 'get',
+                     reverse('posts:post_create'), None, reader),
+            Scenario('posts:post_create:post', 'post',
+                     reverse('posts:post_create'),
+                     {'text': 'Пост из замера'}, reader),
+        ],
+        'posts:add_comment': [
+            Scenario('posts:add_comment', 'post',
+                     reverse('posts:add_comment', args=[post.pk]),
+                     {'text': 'Комментарий из замера'}, reader),
+        ],
+        'posts:follow_index': [
+            Scenario('posts:follow_index', 'get',
+                     reverse('posts:follow_index'), None, reader),
+        ],
+        'posts:search': [
+            Scenario('posts:search', 'get',
+                     f'{reverse("posts:search")}?q={data.word}', None,
+                     None),
+        ],
+        'posts:profile_follow': [
+            Scenario('posts:profile_follow', 'get',
+                     reverse('posts:profile_follow',
+                             args=[data.not_followed.username]),
+                     None, reader),
+        ],
+        'posts:profile_unfollow': [
+            Scenario('posts:profile_unfollow', 'get',
+                     reverse('posts:profile_unfollow',
+                             args=[data.followed.username]),
+                     None, reader),
+        ],
+        'posts:group_subscribe': [
+            Scenario('posts:group_subscribe', 'get',
+                     reverse('posts:group_subscribe', args=[data.group.slug]),
+                     None, reader),
+        ],
+        'posts:group_unsubscribe': [
+            Scenario('posts:group_unsubscribe', 'get',
+                     reverse('posts:group_unsubscribe',
+                             args=[data.group.slug]),
+                     None, reader),
+        ],
+        'posts:notifications': [
+            Scenario('posts:notifications', 'get',
+                     reverse('posts:notifications'), None, author),
+        ],
+        'users:login': [
+            Scenario('users:login', 'get', reverse('users:login'), None,
+                     None),
+        ],
+        'users:logout': [
+            Scenario('users:logout', 'get', reverse('users:logout'), None,
+                     None),
+        ],
+        'users:signup': [
+            Scenario('users:signup', 'get', reverse('users:signup'), None,
+                     None),
+        ],
+        'users:password_reset_form': [
+            Scenario('users:password_reset_form', 'get',
+                     reverse('users:password_reset_form'), None, None),
+        ],
+        'about:author': [
+            Scenario('about:author', 'get', reverse('about:author'), None,
+                     None),
+        ],
+        'about:tech': [
+            Scenario('about:tech', 'get', reverse('about:tech'), None,
+                     None),
+        ],
+    }
+
+
+def route_names():
+    """Имена всех маршрутов приложений из APPS."""
+    names = []
+    for app in APPS:
+        urls = import_module(f'{app}.urls')
+        names += [
+            f'{urls.app_name}:{pattern.name}'
+            for pattern in urls.urlpatterns if pattern.name
+        ]
+    return names
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[rank]
+
+
+class Runner:
+    def __init__(self, iterations=20, warmup=3):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.clients = {}
+
+    def client(self, user):
+        if user not in self.clients:
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            self.clients[user] = client
+        return self.clients[user]
+
+    def request(self, scenario):
+        client = self.client(scenario.user)
+        with transaction.atomic():
+            response = getattr(client, scenario.method)(
+                scenario.url, scenario.data or {}
+            )
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, scenario):
+        for _ in range(self.warmup):
+            self.request(scenario)
+        timings = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            self.request(scenario)
+            timings.append((time.perf_counter() - start) * 1000)
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                status = self.request(scenario).status_code
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'status': status,
+            'p50': percentile(timings, 50),
+            'p90': percentile(timings, 90),
+            'p99': percentile(timings, 99),
+            'queries': len(queries),
+            'memory': peak // 1024,
+        }
+
+    def run(self, scenarios, only=None):
+        results = {}
+        for scenario in scenarios:
+            if only and not any(name in scenario.name for name in only):
+                continue
+            results[scenario.name] = self.measure(scenario)
+        return results
+
+
+def run(iterations=20, warmup=3, only=None):
+    """Замеряет все маршруты. Возвращает {сценарий: показатели}."""
+    scenarios = get_scenarios(Dataset())
+    missing = set(route_names()) - set(scenarios)
+    if missing:
+        raise BenchmarkError(
+            'Нет сценариев для маршрутов: ' + ', '.join(sorted(missing))
+        )
+    return Runner(iterations, warmup).run(
+        [scenario for name in route_names() for scenario in scenarios[name]],
+        only
+    )
+
+
+def first_request(name):
+    """Время первого запроса сценария в этом процессе, в миллисекундах.
+
+    Вход пользователя и выбор данных в замер не входят.
+    """
+    scenarios = {
+        scenario.name: scenario
+        for group in get_scenarios(Dataset()).values() for scenario in group
+    }
+    if name not in scenarios:
+        raise BenchmarkError(f'Нет сценария {name}')
+    scenario = scenarios[name]
+    runner = Runner()
+    runner.client(scenario.user)
+    start = time.perf_counter()
+    runner.request(scenario)
+    return (time.perf_counter() - start) * 1000
+
+
+def compare(baseline, results, tolerance=0.25, min_delta=1.0):
+    """Регрессии относительно базовых замеров.
+
+    Число запросов не должно расти вовсе, медиана времени и память — больше
+    чем на tolerance. Хвосты распределения на коротких прогонах слишком
+    шумные и только выводятся. Разница во времени меньше min_delta
+    миллисекунд считается шумом.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if current['queries'] > base['queries']:
+            regressions.append(
+                f'{name}: запросов {current["queries"]} вместо '
+                f'{base["queries"]}'
+            )
+        if (current['p50'] > base['p50'] * (1 + tolerance)
+                and current['p50'] - base['p50'] > min_delta):
+            regressions.append(
+                f'{name}: p50 {current["p50"]:.1f} мс вместо '
+                f'{base["p50"]:.1f} мс'
+            )
+        if current['memory'] > base['memory'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: память {current["memory"]} КиБ вместо '
+                f'{base["memory"]} КиБ'
+            )
+    return regressions
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2, sort_keys=True)
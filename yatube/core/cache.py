@@ -0,0 +1,26 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import MemcachedCache
+
+from . import metrics
+
+_missing = object()
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи кэша для метрик запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            metrics.add('cache_misses', 1)
+            return default
+        metrics.add('cache_hits', 1)
+        return value
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    """Кэш в памяти процесса, для разработки и тестов."""
+
+
+class InstrumentedMemcachedCache(InstrumentedCacheMixin, MemcachedCache):
+    """Общий для всех воркеров кэш в memcached (пакет python-memcached)."""
@@ -0,0 +1,8 @@
+from django.conf import settings
+
+
+def fragment_cache(request):
+    """Добавляет срок жизни закэшированных фрагментов страниц."""
+    return {
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT
+    }
@@ -0,0 +1,68 @@
+"""Чтение с реплик базы данных.
+
+Реплики используются только при обработке запросов: команды, фоновые
+задачи и всё, что идёт внутри транзакции основной базы, читает с неё.
+На время запроса выбирается одна реплика, чтобы страница не собиралась
+из реплик с разным отставанием. После записи чтение до конца запроса и
+ещё REPLICA_PIN_SECONDS секунд (по куке) идёт в основную базу, так
+пользователь сразу видит свой пост, комментарий или подписку. Так же
+закрепляются чтения под свежими версиями кэша, см. posts.caching.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+
+_state = threading.local()
+
+
+def start(pinned=False):
+    """Начинает запрос: выбирает реплику для его чтений."""
+    replicas = settings.DATABASE_REPLICAS
+    _state.replica = random.choice(replicas) if replicas else None
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def finish():
+    _state.replica = None
+    _state.pinned = False
+
+
+def pin():
+    """Направляет оставшиеся чтения запроса в основную базу."""
+    _state.pinned = True
+
+
+def reading_replica():
+    """Идут ли сейчас чтения на реплику."""
+    return ReplicaRouter().db_for_read(None) != DEFAULT_DB_ALIAS
+
+
+def wrote():
+    """Была ли запись в основную базу за время запроса."""
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, 'replica', None)
+        if (replica is None or getattr(_state, 'pinned', False)
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        _state.pinned = True
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
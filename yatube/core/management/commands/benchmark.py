@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark, slow_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время, SQL-запросы и память страниц posts, users и about '
+        'и сравнивает с базовыми замерами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--only', nargs='*',
+            help='Замерить только сценарии, в имени которых есть подстрока'
+        )
+        parser.add_argument(
+            '--baseline', default=settings.BENCHMARK_BASELINE,
+            help='Файл с базовыми замерами'
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Записать результаты как новые базовые замеры'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост времени и памяти, доля от базового'
+        )
+        parser.add_argument(
+            '--slow-queries', type=float, metavar='MS',
+            help='Собрать запросы дольше MS миллисекунд и вывести худшие'
+        )
+
+    def handle(self, *args, **options):
+        if options['slow_queries'] is not None:
+            slow_queries.enable(options['slow_queries'])
+        try:
+            results = benchmark.run(
+                options['iterations'], options['warmup'], options['only']
+            )
+        except benchmark.BenchmarkError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            f'{"сценарий":<32} {"код":>4} {"p50":>8} {"p90":>8} {"p99":>8} '
+            f'{"запросы":>8} {"КиБ":>8}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<32} {result["status"]:>4} {result["p50"]:>8.2f} '
+                f'{result["p90"]:>8.2f} {result["p99"]:>8.2f} '
+                f'{result["queries"]:>8} {result["memory"]:>8}'
+            )
+        if options['slow_queries'] is not None:
+            self.stdout.write('Самые затратные медленные запросы:')
+            self.stdout.write(slow_queries.log.render())
+        if options['save']:
+            benchmark.save(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовые замеры записаны в {options["baseline"]}'
+            ))
+            return
+        try:
+            baseline = benchmark.load(options['baseline'])
+        except FileNotFoundError:
+            self.stdout.write(
+                'Базовых замеров нет, сохраните их параметром --save'
+            )
+            return
+        regressions = benchmark.compare(
+            baseline, results, options['tolerance']
+        )
+        if regressions:
+            raise CommandError(
+                'Производительность ухудшилась:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
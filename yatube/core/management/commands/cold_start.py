@@ -0,0 +1,88 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+from core.template import preload
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет первый запрос к каждой странице в свежем процессе '
+        'для нескольких профилей настроек'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+',
+            default=['yatube.settings', 'yatube.settings_prod'],
+            help='Модули настроек для сравнения'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Сколько процессов запускать на сценарий, берётся медиана'
+        )
+        parser.add_argument(
+            '--only', nargs='*',
+            help='Замерить только сценарии, в имени которых есть подстрока'
+        )
+        # Режим дочернего процесса: один сценарий, вывод в миллисекундах
+        parser.add_argument('--scenario', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        try:
+            if options['scenario']:
+                if settings.TEMPLATE_PRELOAD:
+                    # Так же, как при старте воркера в yatube/wsgi.py
+                    preload()
+                self.stdout.write(
+                    str(benchmark.first_request(options['scenario']))
+                )
+                return
+            names = [
+                scenario.name
+                for name, scenarios in benchmark.get_scenarios(
+                    benchmark.Dataset()
+                ).items()
+                for scenario in scenarios
+                if not options['only']
+                or any(part in scenario.name for part in options['only'])
+            ]
+        except benchmark.BenchmarkError as error:
+            raise CommandError(error)
+        profiles = options['profiles']
+        self.stdout.write(
+            f'{"сценарий":<32} ' + ' '.join(
+                f'{profile.rsplit(".", 1)[-1]:>14}' for profile in profiles
+            )
+        )
+        for name in names:
+            timings = [
+                statistics.median(
+                    self.measure(name, profile)
+                    for _ in range(options['repeat'])
+                )
+                for profile in profiles
+            ]
+            self.stdout.write(
+                f'{name:<32} '
+                + ' '.join(f'{timing:>14.1f}' for timing in timings)
+            )
+
+    def measure(self, name, profile):
+        result = subprocess.run(
+            [
+                sys.executable,
+                os.path.join(settings.BASE_DIR, 'manage.py'),
+                'cold_start', '--scenario', name, '--settings', profile,
+            ],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return float(result.stdout.strip().splitlines()[-1])
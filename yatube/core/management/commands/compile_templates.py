@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.template import preload
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает все шаблоны из каталога templates и сообщает об ошибках, '
+        'запускается при выкладке'
+    )
+
+    def handle(self, *args, **options):
+        total, errors = preload()
+        if errors:
+            raise CommandError('\n'.join(
+                f'{name}: {error}' for name, error in sorted(errors.items())
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Шаблонов разобрано: {total}'))
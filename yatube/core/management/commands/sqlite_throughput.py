@@ -0,0 +1,189 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from core import sqlite
+from posts.models import Comment, Post, User
+
+# Таймаут блокировки модуля sqlite3 по умолчанию, секунды
+DEFAULT_TIMEOUT = 5.0
+
+
+class Workload:
+    """Чтение ленты и запись комментария, как их делают вью posts.
+
+    Профиль shipped — прежние настройки: журнал DELETE, новое соединение
+    на каждую операцию, без повторов. Профиль tuned — SQLITE_PRAGMAS,
+    соединение на воркер и повторы записи при блокировке.
+    """
+
+    def __init__(self, path, tuned):
+        self.path = path
+        self.tuned = tuned
+        read = Post.objects.select_related('author', 'group')[:10]
+        sql, self.read_params = read.query.sql_with_params()
+        self.read_sql = sql.replace('%s', '?')
+        self.insert_sql = (
+            f'INSERT INTO {Comment._meta.db_table} '
+            '(text, author_id, post_id, created) VALUES (?, ?, ?, ?)'
+        )
+        self.update_sql = (
+            f'UPDATE {Post._meta.db_table} '
+            'SET comments_count = comments_count + 1 WHERE id = ?'
+        )
+        self.select_sql = (
+            f'SELECT id FROM {Post._meta.db_table} WHERE id = ?'
+        )
+        self.post_ids = list(
+            Post.objects.values_list('id', flat=True)[:1000]
+        )
+        self.user_ids = list(User.objects.values_list('id', flat=True)[:1000])
+        self.lock = threading.Lock()
+        self.stats = {'reads': 0, 'writes': 0, 'errors': 0, 'retries': 0}
+        self.latencies = {'reads': [], 'writes': []}
+
+    def connect(self):
+        connection = sqlite3.connect(
+            self.path, timeout=DEFAULT_TIMEOUT, isolation_level=None,
+            check_same_thread=False
+        )
+        if self.tuned:
+            sqlite.apply_pragmas(connection.cursor())
+        return connection
+
+    def read(self, connection):
+        connection.execute(self.read_sql, self.read_params).fetchall()
+
+    def write(self, connection):
+        # Транзакция начинается с чтения, как add_comment в atomic
+        post_id = random.choice(self.post_ids)
+        connection.execute('BEGIN')
+        try:
+            connection.execute(self.select_sql, (post_id,)).fetchone()
+            connection.execute(self.insert_sql, (
+                'Комментарий', random.choice(self.user_ids), post_id,
+                timezone.now().isoformat(' ')
+            ))
+            connection.execute(self.update_sql, (post_id,))
+            connection.execute('COMMIT')
+        except sqlite3.OperationalError:
+            connection.execute('ROLLBACK')
+            raise
+
+    def operation(self, connection, action):
+        attempts = settings.SQLITE_WRITE_RETRIES if self.tuned else 0
+        for attempt in range(attempts + 1):
+            try:
+                return action(connection)
+            except sqlite3.OperationalError as error:
+                if attempt == attempts or not sqlite.is_locked(error):
+                    raise
+            with self.lock:
+                self.stats['retries'] += 1
+            sqlite.backoff(attempt)
+
+    def worker(self, deadline, write_ratio):
+        connection = self.connect() if self.tuned else None
+        while time.perf_counter() < deadline:
+            kind = 'writes' if random.random() < write_ratio else 'reads'
+            started = time.perf_counter()
+            current = connection or self.connect()
+            try:
+                self.operation(
+                    current, self.write if kind == 'writes' else self.read
+                )
+            except sqlite3.OperationalError:
+                with self.lock:
+                    self.stats['errors'] += 1
+                continue
+            finally:
+                if current is not connection:
+                    current.close()
+            duration = time.perf_counter() - started
+            with self.lock:
+                self.stats[kind] += 1
+                self.latencies[kind].append(duration)
+        if connection is not None:
+            connection.close()
+
+    def run(self, workers, seconds, write_ratio):
+        deadline = time.perf_counter() + seconds
+        threads = [
+            threading.Thread(target=self.worker, args=(deadline, write_ratio))
+            for _ in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.stats, self.latencies
+
+
+def p99(values):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * 0.99))] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения и записи SQLite '
+        'с прежними настройками и с профилем SQLITE_PRAGMAS на копии базы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля операций записи'
+        )
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Замер рассчитан на базу SQLite')
+        if not Post.objects.exists():
+            raise CommandError('База пуста, заполните её generate_data')
+        self.stdout.write(
+            f'{"профиль":<8} {"чтений/с":>10} {"записей/с":>10} '
+            f'{"p99 чт.":>8} {"p99 зап.":>9} {"повторы":>8} {"ошибки":>7}'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            for name, tuned in (('shipped', False), ('tuned', True)):
+                path = os.path.join(directory, f'{name}.sqlite3')
+                self.copy(database['NAME'], path, tuned)
+                stats, latencies = Workload(path, tuned).run(
+                    options['workers'], options['seconds'],
+                    options['write_ratio']
+                )
+                seconds = options['seconds']
+                self.stdout.write(
+                    f'{name:<8} {stats["reads"] / seconds:>10.1f} '
+                    f'{stats["writes"] / seconds:>10.1f} '
+                    f'{p99(latencies["reads"]):>8.1f} '
+                    f'{p99(latencies["writes"]):>9.1f} '
+                    f'{stats["retries"]:>8} {stats["errors"]:>7}'
+                )
+
+    def copy(self, source, target, tuned):
+        """Копия базы в журнале нужного профиля."""
+        source = sqlite3.connect(source)
+        copy = sqlite3.connect(target)
+        try:
+            source.backup(copy)
+            copy.execute(
+                'PRAGMA journal_mode = {}'.format('WAL' if tuned else 'DELETE')
+            )
+        finally:
+            copy.close()
+            source.close()
@@ -0,0 +1,36 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+SQLITE = 'django.db.backends.sqlite3'
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из DATABASE_REPLICAS, '
+        'чтобы проверять чтение с реплик на одной машине'
+    )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не заданы, см. DB_REPLICAS')
+        aliases = [DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS]
+        if any(settings.DATABASES[alias]['ENGINE'] != SQLITE
+               for alias in aliases):
+            raise CommandError('Копировать можно только базы SQLite')
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(
+                    f'{alias}: {settings.DATABASES[alias]["NAME"]}'
+                )
+        finally:
+            source.close()
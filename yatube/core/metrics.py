@@ -0,0 +1,184 @@
+"""Метрики производительности запросов.
+
+На время запроса PerformanceMiddleware заводит RequestMetrics в локальном
+для потока хранилище, а инструментированные слои (база, кэш, шаблоны,
+нарезка превью) добавляют в него свои замеры. По завершении запроса
+замеры суммируются по имени маршрута в реестре процесса и отдаются
+страницей metrics в текстовом формате Prometheus.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограммы времени запроса, в секундах
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Имя маршрута для замеров вне запроса, например фоновой нарезки превью
+BACKGROUND = 'background'
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+    FIELDS = (
+        'db_queries', 'db_time', 'cache_hits', 'cache_misses',
+        'template_time', 'thumbnail_time',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def duration(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, duration):
+        """Значение заголовка Server-Timing, длительности в миллисекундах."""
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.db_queries} queries"',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} misses"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'thumb;dur={self.thumbnail_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def finish():
+    _local.metrics = None
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+def add(field, value):
+    """Добавляет замер к текущему запросу или к фоновым замерам."""
+    metrics = current()
+    if metrics is not None:
+        setattr(metrics, field, getattr(metrics, field) + value)
+    else:
+        registry.add(BACKGROUND, field, value)
+
+
+@contextmanager
+def timer(field):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(field, time.perf_counter() - started)
+
+
+def _escape(value):
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+class Registry:
+    """Суммы замеров по именам маршрутов в пределах процесса."""
+
+    # Счётчики: поле замера, имя метрики, описание
+    COUNTERS = (
+        ('db_queries', 'yatube_db_queries_total', 'Запросы к базе'),
+        ('db_time', 'yatube_db_duration_seconds_total',
+         'Время запросов к базе'),
+        ('cache_hits', 'yatube_cache_hits_total', 'Попадания в кэш'),
+        ('cache_misses', 'yatube_cache_misses_total', 'Промахи кэша'),
+        ('template_time', 'yatube_template_duration_seconds_total',
+         'Время отрисовки шаблонов'),
+        ('thumbnail_time', 'yatube_thumbnail_duration_seconds_total',
+         'Время нарезки превью'),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def _view(self, view):
+        if view not in self.views:
+            self.views[view] = {
+                'requests': {},
+                'buckets': [0] * len(BUCKETS),
+                'duration': 0.0,
+                'count': 0,
+                **{field: 0 for field in RequestMetrics.FIELDS},
+            }
+        return self.views[view]
+
+    def add(self, view, field, value):
+        with self.lock:
+            self._view(view)[field] += value
+
+    def record(self, view, status, metrics, duration):
+        with self.lock:
+            stats = self._view(view)
+            stats['requests'][status] = stats['requests'].get(status, 0) + 1
+            stats['count'] += 1
+            stats['duration'] += duration
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    stats['buckets'][index] += 1
+            for field in RequestMetrics.FIELDS:
+                stats[field] += getattr(metrics, field)
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        with self.lock:
+            views = sorted(
+                (_escape(view), stats) for view, stats in self.views.items()
+            )
+            lines = [
+                '# HELP yatube_requests_total Обработанные запросы',
+                '# TYPE yatube_requests_total counter',
+            ]
+            for view, stats in views:
+                for status, total in sorted(stats['requests'].items()):
+                    lines.append(
+                        f'yatube_requests_total{{view="{view}",'
+                        f'status="{status}"}} {total}'
+                    )
+            lines += [
+                '# HELP yatube_request_duration_seconds Время запроса',
+                '# TYPE yatube_request_duration_seconds histogram',
+            ]
+            for view, stats in views:
+                if not stats['count']:
+                    continue
+                name = 'yatube_request_duration_seconds'
+                for bound, total in zip(BUCKETS, stats['buckets']):
+                    lines.append(
+                        f'{name}_bucket{{view="{view}",le="{bound}"}} {total}'
+                    )
+                lines += [
+                    f'{name}_bucket{{view="{view}",le="+Inf"}} '
+                    f'{stats["count"]}',
+                    f'{name}_sum{{view="{view}"}} {stats["duration"]}',
+                    f'{name}_count{{view="{view}"}} {stats["count"]}',
+                ]
+            for field, name, description in self.COUNTERS:
+                lines += [
+                    f'# HELP {name} {description}',
+                    f'# TYPE {name} counter',
+                ]
+                lines += [
+                    f'{name}{{view="{view}"}} {stats[field]}'
+                    for view, stats in views
+                ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
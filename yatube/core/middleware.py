@@ -0,0 +1,76 @@
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_router, metrics
+
+
+def count_query(execute, sql, params, many, context):
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add('db_time', perf_counter() - started)
+        metrics.add('db_queries', 1)
+
+
+class PerformanceMiddleware:
+    """Замеряет запрос и отдаёт замеры в заголовке Server-Timing.
+
+    Должна стоять первой в MIDDLEWARE, чтобы учитывать работу остальных.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(count_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.finish()
+        duration = request_metrics.duration()
+        match = request.resolver_match
+        metrics.registry.record(
+            match.view_name if match else 'unknown',
+            response.status_code,
+            request_metrics,
+            duration
+        )
+        response['Server-Timing'] = request_metrics.server_timing(duration)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics.current().view = request.resolver_match.view_name
+
+
+class PrimaryPinMiddleware:
+    """Направляет чтения на реплики и закрепляет пишущих за основной базой.
+
+    После запроса с записью ставит куку на REPLICA_PIN_SECONDS, пока она
+    жива, чтения пользователя идут в основную базу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.start(pinned=db_router.PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+            wrote = db_router.wrote()
+        finally:
+            db_router.finish()
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                db_router.PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True
+            )
+        return response
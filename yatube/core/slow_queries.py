@@ -0,0 +1,186 @@
+"""Журнал медленных SQL-запросов.
+
+Включается настройкой SLOW_QUERY_LOG. Обёртка ставится на каждое новое
+соединение с базой и замеряет все запросы, а не только запросы страниц.
+Запрос дольше SLOW_QUERY_THRESHOLD миллисекунд пишется в лог
+core.slow_queries вместе с маршрутом, строкой кода проекта, откуда он
+пришёл, и планом выполнения. Запросы группируются по отпечатку:
+SQL без литералов и с одним значением в списках IN. План снимается
+один раз на отпечаток.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import traceback
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'\bIN \((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE)
+SPACES = re.compile(r'\s+')
+
+# Обёртки проекта, которые не считаются источником запроса
+SKIP_FILES = {
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ('slow_queries.py', 'middleware.py', 'template.py')
+}
+
+_local = threading.local()
+
+
+def fingerprint(sql):
+    """Нормализованный SQL и его короткий хеш."""
+    normalized = LITERALS.sub('?', sql)
+    normalized = IN_LISTS.sub('IN (...)', normalized)
+    normalized = SPACES.sub(' ', normalized).strip()
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+
+def caller():
+    """Ближайшая к запросу строка кода проекта вне этого модуля."""
+    for frame in reversed(traceback.extract_stack()):
+        path = frame.filename
+        if (path.startswith(settings.BASE_DIR)
+                and 'site-packages' not in path
+                and path not in SKIP_FILES):
+            return (
+                f'{os.path.relpath(path, settings.BASE_DIR)}:{frame.lineno} '
+                f'in {frame.name}'
+            )
+    return 'unknown'
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return ''
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {sql}', params
+            )
+            return '\n'.join(
+                ' '.join(str(value) for value in row)
+                for row in cursor.fetchall()
+            )
+    except Exception as error:
+        return f'EXPLAIN не удался: {error}'
+    finally:
+        _local.explaining = False
+
+
+class SlowQueryLog:
+    """Отпечатки медленных запросов с количеством и временем."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.threshold = None
+
+    def record(self, connection, sql, params, duration):
+        key, normalized = fingerprint(sql)
+        request = metrics.current()
+        view = getattr(request, 'view', None) or metrics.BACKGROUND
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {
+                    'fingerprint': key,
+                    'sql': normalized,
+                    'count': 0,
+                    'total': 0.0,
+                    'max': 0.0,
+                    'views': {},
+                    'caller': caller(),
+                    'explain': None,
+                }
+            entry['count'] += 1
+            entry['total'] += duration
+            entry['max'] = max(entry['max'], duration)
+            entry['views'][view] = entry['views'].get(view, 0) + 1
+            new = entry['explain'] is None
+            if new:
+                entry['explain'] = ''
+        if new:
+            entry['explain'] = explain(connection, sql, params)
+        logger.warning(
+            'Медленный запрос %s: %.1f мс, %s, %s\n%s%s',
+            key, duration * 1000, view, entry['caller'], sql,
+            f'\n{entry["explain"]}' if new and entry['explain'] else ''
+        )
+
+    def top(self, limit=10):
+        """Отпечатки с наибольшим суммарным временем."""
+        with self.lock:
+            entries = sorted(
+                self.entries.values(), key=lambda entry: -entry['total']
+            )
+        return entries[:limit]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def render(self, limit=10):
+        lines = []
+        for entry in self.top(limit):
+            views = ', '.join(
+                f'{view} ×{count}'
+                for view, count in sorted(entry['views'].items())
+            )
+            lines += [
+                f'{entry["fingerprint"]}: {entry["count"]} раз, всего '
+                f'{entry["total"] * 1000:.1f} мс, максимум '
+                f'{entry["max"] * 1000:.1f} мс',
+                f'  маршруты: {views}',
+                f'  код: {entry["caller"]}',
+                f'  {entry["sql"]}',
+            ]
+            lines += [f'    {line}' for line in entry['explain'].splitlines()]
+        return '\n'.join(lines)
+
+
+log = SlowQueryLog()
+
+
+def watch(execute, sql, params, many, context):
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = perf_counter() - started
+        if (duration * 1000 >= log.threshold
+                and not many
+                and not getattr(_local, 'explaining', False)):
+            log.record(context['connection'], sql, params, duration)
+
+
+def install(sender, connection, **kwargs):
+    if watch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(watch)
+
+
+def enable(threshold=None):
+    """Ставит обёртку на открытые и на все новые соединения."""
+    log.threshold = (
+        settings.SLOW_QUERY_THRESHOLD if threshold is None else threshold
+    )
+    connection_created.connect(install, dispatch_uid='core.slow_queries')
+    for connection in connections.all():
+        install(None, connection)
+
+
+def disable():
+    connection_created.disconnect(dispatch_uid='core.slow_queries')
+    for connection in connections.all():
+        if watch in connection.execute_wrappers:
+            connection.execute_wrappers.remove(watch)
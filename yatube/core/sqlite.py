@@ -0,0 +1,59 @@
+"""Профиль SQLite для нескольких воркеров.
+
+Прагмы из SQLITE_PRAGMAS выполняются на каждом новом соединении: журнал
+WAL позволяет читать во время записи, synchronous=NORMAL переносит fsync
+на контрольные точки. Блокировку, которую не снял busy timeout (например,
+транзакцию, начавшую писать после чтения устаревшего снимка), повторяет
+декоратор retry_locked.
+"""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+
+def apply_pragmas(cursor):
+    """Выполняет прагмы профиля; годится и для курсора sqlite3."""
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor)
+
+
+def is_locked(error):
+    return 'database is locked' in str(error)
+
+
+def backoff(attempt):
+    """Пауза перед повтором, экспоненциальная со случайной добавкой."""
+    # Случайная добавка разводит воркеры, упёршиеся друг в друга
+    time.sleep(settings.SQLITE_RETRY_DELAY * 2 ** attempt * random.random())
+
+
+def retry_locked(view):
+    """Повторяет запись во вью, если база заблокирована.
+
+    Вью выполняется в транзакции, поэтому повтор начинается с чистого
+    листа. Внутри внешней транзакции повторять нельзя, и вью вызывается
+    как есть.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if connection.in_atomic_block:
+            return view(request, *args, **kwargs)
+        attempts = settings.SQLITE_WRITE_RETRIES
+        for attempt in range(attempts + 1):
+            try:
+                with transaction.atomic():
+                    return view(request, *args, **kwargs)
+            except OperationalError as error:
+                if attempt == attempts or not is_locked(error):
+                    raise
+            backoff(attempt)
+    return wrapper
@@ -0,0 +1,54 @@
+import os
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.backends import django
+
+from . import metrics
+
+
+class Template(django.Template):
+    """Шаблон, время отрисовки которого попадает в метрики запроса.
+
+    Вложенные шаблоны рисуются внутри внешнего и отдельно не считаются.
+    """
+
+    def render(self, context=None, request=None):
+        with metrics.timer('template_time'):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django.reraise(exc, self)
+
+
+def template_names(directory):
+    """Имена всех шаблонов каталога относительно него."""
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            yield os.path.relpath(os.path.join(root, name), directory)
+
+
+def preload():
+    """Разбирает все шаблоны из DIRS движков.
+
+    С кэширующим загрузчиком разобранные шаблоны остаются в памяти, и
+    первые запросы не читают их с диска. Возвращает число шаблонов и
+    словарь ошибок {имя: ошибка}.
+    """
+    total, errors = 0, {}
+    for engine in engines.all():
+        for directory in engine.engine.dirs:
+            for name in template_names(directory):
+                total += 1
+                try:
+                    engine.get_template(name)
+                except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+                    errors[name] = error
+    return total, errors
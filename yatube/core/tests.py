@@ -1,6 +1,19 @@
-from django.test import Client, TestCase
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
 from http import HTTPStatus
 
+from core import benchmark, db_router, metrics, slow_queries, sqlite
+from posts import caching
+from posts.models import Comment, Follow, Group, Post, User
+from posts.templatetags import post_cards
+
 
 class CoreTest(TestCase):
     """Проверка страницы 404"""
@@ -11,3 +24,266 @@ class CoreTest(TestCase):
         response = self.guest_client.get('/not-found-page/')
         self.assertTemplateUsed(response, 'core/404.html')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class BenchmarkTest(TestCase):
+    """Проверка замеров производительности"""
+    def test_percentile(self):
+        """Перцентиль по ближайшему рангу"""
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(benchmark.percentile(values, 50), 3)
+        self.assertEqual(benchmark.percentile(values, 90), 5)
+        self.assertEqual(benchmark.percentile(values, 1), 1)
+
+    def test_compare(self):
+        """Регрессией считается рост запросов, медианы времени и памяти"""
+        baseline = {'page': {'p50': 10.0, 'queries': 3, 'memory': 100}}
+        self.assertEqual(benchmark.compare(baseline, {
+            'page': {'p50': 11.0, 'queries': 3, 'memory': 110},
+            'new': {'p50': 50.0, 'queries': 9, 'memory': 900},
+        }), [])
+        self.assertEqual(len(benchmark.compare(baseline, {
+            'page': {'p50': 20.0, 'queries': 4, 'memory': 200},
+        })), 3)
+
+    def test_all_routes_measured(self):
+        """Замеряются все маршруты, данные после замера не меняются"""
+        author = User.objects.create_user(username='Author')
+        reader = User.objects.create_user(username='Reader')
+        User.objects.create_user(username='Other')
+        group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(author=author, text='Пост', group=group)
+        Comment.objects.create(author=reader, post=post, text='Комментарий')
+        results = benchmark.run(iterations=1, warmup=0)
+        for name in benchmark.route_names():
+            self.assertIn(name, results)
+        for name, result in results.items():
+            with self.subTest(msg=name):
+                self.assertLess(result['status'], 400)
+        self.assertEqual(Post.objects.count(), 1)
+
+
+class PerformanceMiddlewareTest(TestCase):
+    """Проверка замеров запросов"""
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+        author = User.objects.create_user(username='Author')
+        Post.objects.create(author=author, text='Пост')
+        self.guest_client = Client()
+
+    def test_server_timing(self):
+        """Ответ содержит заголовок Server-Timing с замерами"""
+        response = self.guest_client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'cache;desc=', 'tpl;dur=', 'total;dur='):
+            self.assertIn(name, timing)
+        self.assertNotIn('db;dur=0.0;desc="0 queries"', timing)
+
+    def test_metrics_by_view(self):
+        """Замеры суммируются по имени маршрута"""
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        stats = metrics.registry.views['posts:index']
+        self.assertEqual(stats['count'], 2)
+        self.assertGreater(stats['db_queries'], 0)
+        self.assertGreater(stats['cache_hits'], 0)
+        self.assertGreater(stats['template_time'], 0)
+        response = self.guest_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        body = response.content.decode()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="200"} 2', body
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            body
+        )
+
+    def test_metrics_forbidden(self):
+        """Страница метрик закрыта для внешних адресов"""
+        response = self.guest_client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+
+class SlowQueryLogTest(TestCase):
+    """Проверка журнала медленных запросов"""
+    def setUp(self):
+        cache.clear()
+        slow_queries.log.clear()
+        author = User.objects.create_user(username='Author')
+        Post.objects.create(author=author, text='Пост')
+        slow_queries.enable(threshold=0)
+        self.addCleanup(slow_queries.disable)
+
+    def test_fingerprint(self):
+        """Литералы и списки IN не различают отпечатки"""
+        first, normalized = slow_queries.fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a'  LIMIT 5"
+        )
+        second, _ = slow_queries.fingerprint(
+            "SELECT * FROM t WHERE id IN (%s) AND name = 'bb' LIMIT 10"
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(
+            normalized,
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+        )
+
+    def test_queries_grouped_with_explain(self):
+        """Запросы страницы попадают в журнал с маршрутом и планом"""
+        with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            Client().get(reverse('posts:index'))
+        self.assertTrue(any(
+            'posts_post' in record.getMessage() for record in logs.records
+        ))
+        entries = [
+            entry for entry in slow_queries.log.top(100)
+            if 'posts_post' in entry['sql']
+            and entry['sql'].startswith('SELECT')
+            and 'posts:index' in entry['views']
+        ]
+        self.assertTrue(entries)
+        entry = entries[0]
+        self.assertEqual(entry['views'], {'posts:index': 1})
+        self.assertIn('posts/', entry['caller'])
+        self.assertTrue(entry['explain'])
+        self.assertIn(entry['fingerprint'], slow_queries.log.render(100))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(TransactionTestCase):
+    """Проверка чтения с реплик"""
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        self.addCleanup(db_router.finish)
+
+    def test_reads_from_replica_in_request(self):
+        """В запросе чтение идёт с реплики, вне запроса — с основной"""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        db_router.start()
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_pinned_reads_from_primary(self):
+        """Кука после записи закрепляет чтение за основной базой"""
+        db_router.start(pinned=True)
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_transaction_reads_from_primary(self):
+        """Внутри транзакции чтение идёт с основной базы"""
+        db_router.start()
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_recent_version_reads_from_primary(self):
+        """Под свежей версией кэша чтение идёт с основной базы"""
+        cache.set(caching.PREFIX + 'old', caching._new_version() - 10 ** 8)
+        db_router.start()
+        caching.get_versions('old')
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
+        caching.touch('new')
+        caching.get_versions('old', 'new')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertFalse(db_router.wrote())
+
+    def test_recent_cards_not_cached_from_replica(self):
+        """Карточки с реплики под свежей версией не кэшируются"""
+        cache.clear()
+        author = User.objects.create_user(username='Author')
+        post = Post.objects.create(author=author, text='Пост')
+        db_router.start()
+        cards = post_cards.post_cards([post])
+        self.assertIn('Пост', cards[0])
+        self.assertFalse([
+            key for key in cache._cache if post_cards.CARD_PREFIX in key
+        ])
+
+    def test_no_migrations_on_replicas(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class PrimaryPinMiddlewareTest(TestCase):
+    """Проверка закрепления за основной базой после записи"""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        self.client.force_login(self.user)
+
+    def test_pin_cookie_after_write(self):
+        """После комментария ставится кука, после чтения — нет"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': 'Комментарий'}
+        )
+        cookie = response.cookies[db_router.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 5)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_cookie_without_replicas(self):
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': 'Комментарий'}
+        )
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+
+
+class SQLiteProfileTest(TransactionTestCase):
+    """Проверка профиля SQLite"""
+    def test_pragmas_applied(self):
+        """Прагмы выполняются на новом соединении"""
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -64000)
+            cursor.execute('PRAGMA synchronous')
+            # 1 — NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    @override_settings(SQLITE_RETRY_DELAY=0)
+    def test_retry_locked(self):
+        """Запись при блокировке повторяется в новой транзакции"""
+        calls = []
+
+        @sqlite.retry_locked
+        def view(request):
+            calls.append(connection.in_atomic_block)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        self.assertEqual(view(None), 'ok')
+        self.assertEqual(calls, [True, True, True])
+
+    @override_settings(SQLITE_RETRY_DELAY=0, SQLITE_WRITE_RETRIES=1)
+    def test_retry_gives_up(self):
+        @sqlite.retry_locked
+        def view(request):
+            raise OperationalError('database is locked')
+
+        with self.assertRaises(OperationalError):
+            view(None)
+
+
+class TemplatePreloadTest(TestCase):
+    """Проверка разбора шаблонов при выкладке"""
+    def test_compile_templates(self):
+        """Все шаблоны из templates разбираются без ошибок"""
+        out = StringIO()
+        call_command('compile_templates', stdout=out)
+        self.assertIn('Шаблонов разобрано', out.getvalue())
+
+    def test_prod_settings_use_cached_loader(self):
+        from yatube import settings_prod
+        self.assertFalse(settings_prod.DEBUG)
+        loader, _ = settings_prod.TEMPLATES[0]['OPTIONS']['loaders'][0]
+        self.assertEqual(loader, 'django.template.loaders.cached.Loader')
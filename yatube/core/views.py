@@ -1,5 +1,11 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import slow_queries as slow_query_log
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +21,25 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def _check_internal(request):
+    if not (request.user.is_staff
+            or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS):
+        raise PermissionDenied
+
+
+def metrics(request):
+    """Метрики процесса в формате Prometheus для сотрудников и INTERNAL_IPS."""
+    _check_internal(request)
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
+
+
+def slow_queries(request):
+    """Самые затратные медленные запросы процесса."""
+    _check_internal(request)
+    return HttpResponse(
+        slow_query_log.log.render(), content_type='text/plain; charset=utf-8'
+    )
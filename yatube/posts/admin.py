@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Comment, Group, Post
+from .models import ArchivedPost, Comment, Group, Post
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -17,6 +17,13 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'archived')
+    search_fields = ('text',)
+    list_filter = ('created',)
+
+
 admin.site.register(Post, PostAdmin)
+admin.site.register(ArchivedPost, ArchivedPostAdmin)
 admin.site.register(Group)
 admin.site.register(Comment)
@@ -0,0 +1,84 @@
+"""Перенос старых постов с комментариями в архивные таблицы.
+
+Горячие таблицы Post и Comment остаются небольшими, а архивные посты
+доступны по прежним адресам через post_detail и profile. Перенос идёт
+пачками, каждая пачка в своей транзакции. Строки удаляются без сигналов:
+счётчики постов автора не меняются, пост по-прежнему его, а кэш и поиск
+обновляются один раз на пачку.
+"""
+from django.db import models, transaction
+
+from . import caching, counters
+from .models import (ArchivedComment, ArchivedPost, Comment, Notification,
+                     Post)
+from .search import get_backend as search_backend
+
+POST_FIELDS = (
+    'id', 'created', 'text', 'author_id', 'group_id', 'image',
+    'image_variants', 'comments_count',
+)
+COMMENT_FIELDS = ('id', 'created', 'text', 'author_id', 'post_id')
+
+
+def _delete(model, field, values):
+    """Удаляет строки без сигналов, каскадом по ссылающимся моделям."""
+    queryset = model._base_manager.filter(**{f'{field}__in': values})
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            continue
+        if relation.on_delete is models.CASCADE:
+            _delete(
+                relation.related_model, relation.field.name,
+                queryset.values('pk')
+            )
+        elif relation.on_delete is models.SET_NULL:
+            relation.related_model._base_manager.filter(
+                **{f'{relation.field.name}__in': queryset.values('pk')}
+            ).update(**{relation.field.name: None})
+    queryset._raw_delete(queryset.db)
+
+
+@transaction.atomic
+def archive_batch(post_ids):
+    """Переносит посты с комментариями в архив."""
+    posts = list(Post.objects.filter(pk__in=post_ids).values(*POST_FIELDS))
+    ArchivedPost.objects.bulk_create(
+        ArchivedPost(**values) for values in posts
+    )
+    ArchivedComment.objects.bulk_create(
+        (
+            ArchivedComment(**values)
+            for values in Comment.objects.filter(
+                post_id__in=post_ids
+            ).values(*COMMENT_FIELDS).iterator()
+        ),
+        batch_size=500
+    )
+    # Уведомления удаляются каскадом без сигналов
+    counters.notifications_removed(
+        Notification.objects.filter(post_id__in=post_ids)
+    )
+    search_backend().remove_posts(post_ids)
+    _delete(Post, 'pk', post_ids)
+    namespaces = {caching.INDEX}
+    for values in posts:
+        namespaces.add(caching.post(values['id']))
+        namespaces.add(caching.profile(values['author_id']))
+        if values['group_id']:
+            namespaces.add(caching.group(values['group_id']))
+    transaction.on_commit(lambda: caching.touch(*namespaces))
+    return len(posts)
+
+
+def archive(before, batch_size=500):
+    """Архивирует посты, созданные раньше before. Возвращает их число."""
+    total = 0
+    while True:
+        post_ids = list(
+            Post.objects.filter(created__lt=before)
+            .order_by('created', 'pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not post_ids:
+            return total
+        total += archive_batch(post_ids)
@@ -0,0 +1,122 @@
+"""Версии закэшированных фрагментов страниц.
+
+Общие для всех пользователей фрагменты (списки постов, пост с
+комментариями) кэшируются на FRAGMENT_CACHE_TIMEOUT. В ключ фрагмента
+входят версии его пространств имён, поэтому при изменении данных
+достаточно сменить версию, и старые фрагменты перестают читаться. Версии
+видны всем воркерам только в общем кэше, см. CACHES в настройках.
+
+Версии читаются из кэша сразу, а реплика базы может отставать. Если
+версия моложе REPLICA_PIN_SECONDS, чтения запроса переводятся на основную
+базу, иначе под новой версией закэшировались бы старые данные.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import db_router
+
+PREFIX = 'posts:version:'
+
+INDEX = 'index'
+GROUPS = 'groups'
+AUTHORS = 'authors'
+TRENDING = 'trending'
+
+
+def group(group_id):
+    return f'group:{group_id}'
+
+
+def author(author_id):
+    return f'author:{author_id}'
+
+
+def profile(author_id):
+    return f'profile:{author_id}'
+
+
+def post(post_id):
+    return f'post:{post_id}'
+
+
+def _new_version():
+    return time.time_ns() // 1000
+
+
+def get_versions(*namespaces):
+    """Версии пространств имён по отдельности, одним обращением к кэшу."""
+    keys = {PREFIX + namespace: namespace for namespace in namespaces}
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    if any(is_recent(version) for version in versions.values()):
+        db_router.pin()
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_version(*namespaces):
+    """Общая версия пространств имён для ключа фрагмента."""
+    versions = get_versions(*namespaces)
+    return '-'.join(str(versions[namespace]) for namespace in namespaces)
+
+
+def version_time(version):
+    """Время последнего изменения данных за версией из get_version."""
+    microseconds = max(int(part) for part in version.split('-'))
+    return datetime.fromtimestamp(microseconds / 10 ** 6, tz=timezone.utc)
+
+
+def is_recent(version):
+    """Могла ли реплика ещё не получить данные за этой версией."""
+    return version_time(str(version)) > datetime.now(
+        tz=timezone.utc
+    ) - timedelta(seconds=settings.REPLICA_PIN_SECONDS)
+
+
+def _set_versions(namespaces):
+    version = _new_version()
+    cache.set_many(
+        {PREFIX + namespace: version for namespace in namespaces}, None
+    )
+
+
+def touch(*namespaces):
+    """Сбрасывает закэшированные фрагменты пространств имён.
+
+    Внутри транзакции версия меняется ещё раз после фиксации: до неё
+    читатели видят старые строки и могли сохранить их под новой версией.
+    """
+    _set_versions(namespaces)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _set_versions(namespaces))
+
+
+def post_changed(instance, old_group_id=None):
+    namespaces = {
+        INDEX,
+        profile(instance.author_id),
+        post(instance.pk),
+    }
+    for group_id in (instance.group_id, old_group_id):
+        if group_id:
+            namespaces.add(group(group_id))
+    touch(*namespaces)
+
+
+def comment_changed(instance):
+    if instance.post_id:
+        touch(post(instance.post_id))
+
+
+def group_changed(instance):
+    touch(GROUPS, group(instance.pk))
+
+
+def author_changed(instance):
+    touch(AUTHORS, author(instance.pk), profile(instance.pk))
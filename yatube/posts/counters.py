@@ -0,0 +1,99 @@
+"""Денормализованные счётчики постов, комментариев, подписок и уведомлений."""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (ArchivedPost, Comment, Counters, Follow, Notification,
+                     Post, User)
+
+
+def _count(queryset, field):
+    """Подзапрос с количеством строк queryset на каждое значение field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def change_user(user_id, **deltas):
+    """Изменяет счётчики пользователя на переданные величины.
+
+    Строка счётчиков заводится при регистрации пользователя, здесь она не
+    создаётся, чтобы каскадное удаление пользователя не воскрешало её.
+    """
+    Counters.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def change_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def notifications_removed(queryset):
+    """Вычитает из счётчиков непрочитанные уведомления перед их удалением.
+
+    Одно обновление на каждую встреченную величину, а не на получателя.
+    """
+    by_delta = defaultdict(list)
+    for user_id, total in queryset.filter(unread=True).order_by().values(
+        'user_id'
+    ).annotate(total=Count('pk')).values_list('user_id', 'total'):
+        by_delta[total].append(user_id)
+    for delta, user_ids in by_delta.items():
+        Counters.objects.filter(user_id__in=user_ids).update(
+            notifications=F('notifications') - delta
+        )
+
+
+def follow_changed(follow, delta):
+    with transaction.atomic():
+        change_user(follow.author_id, followers=delta)
+        change_user(follow.user_id, following=delta)
+
+
+@transaction.atomic
+def rebuild():
+    """Пересчитывает все счётчики с нуля."""
+    Post.objects.update(comments_count=_count(Comment.objects, 'post'))
+    users = User.objects.annotate(
+        # Архивные посты остаются постами автора
+        posts_total=(
+            _count(Post.objects, 'author')
+            + _count(ArchivedPost.objects, 'author')
+        ),
+        followers_total=_count(Follow.objects, 'author'),
+        following_total=_count(Follow.objects, 'user'),
+        notifications_total=_count(
+            Notification.objects.filter(unread=True), 'user'
+        ),
+    ).values_list(
+        'pk', 'posts_total', 'followers_total', 'following_total',
+        'notifications_total'
+    )
+    Counters.objects.all().delete()
+    Counters.objects.bulk_create(
+        (
+            Counters(
+                user_id=pk,
+                posts=posts,
+                followers=followers,
+                following=following,
+                notifications=notifications
+            )
+            for pk, posts, followers, following, notifications
+            in users.iterator()
+        ),
+        batch_size=500
+    )
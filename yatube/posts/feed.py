@@ -0,0 +1,172 @@
+"""Материализованная лента подписок.
+
+Посты рассылаются по лентам подписчиков при публикации (fan-out-on-write).
+Посты авторов с очень большим числом подписчиков не рассылаются, а
+подмешиваются в ленту при чтении (fan-out-on-read), как и посты групп из
+подписок пользователя.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Counters, FeedEntry, Follow, Post
+from .utils import MergedQuerySet
+
+BATCH_SIZE = 500
+
+
+def is_pulled(author_id):
+    """Посты автора подмешиваются при чтении, а не рассылаются."""
+    return Counters.objects.filter(
+        user_id=author_id, followers__gt=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, читаемые при запросе ленты."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__counters__followers__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+    )
+
+
+def _bulk_add(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def _pushed_authors(author_ids):
+    """Авторы из списка, чьи посты рассылаются по лентам."""
+    return set(author_ids) - set(
+        Counters.objects.filter(
+            user_id__in=author_ids,
+            followers__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('user_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    fan_out_many([post])
+
+
+def fan_out_many(posts):
+    """Добавляет пачку новых постов в ленты подписчиков их авторов."""
+    by_author = {}
+    for post in posts:
+        by_author.setdefault(post.author_id, []).append(post)
+    followers = Follow.objects.filter(
+        author_id__in=_pushed_authors(by_author)
+    ).values_list('author_id', 'user_id')
+    _bulk_add(
+        FeedEntry(user_id=user_id, post_id=post.pk, created=post.created)
+        for author_id, user_id in followers.iterator()
+        for post in by_author[author_id]
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    backfill_many([(user_id, author_id)])
+
+
+def backfill_many(follows):
+    """Заполняет ленты по списку новых подписок (user_id, author_id)."""
+    by_author = {}
+    for user_id, author_id in follows:
+        by_author.setdefault(author_id, []).append(user_id)
+    for author_id in _pushed_authors(by_author):
+        posts = list(
+            Post.objects.filter(author_id=author_id).values_list(
+                'pk', 'created'
+            )[:settings.FEED_BACKFILL_SIZE]
+        )
+        _bulk_add(
+            FeedEntry(user_id=user_id, post_id=post_id, created=created)
+            for user_id in by_author[author_id]
+            for post_id, created in posts
+        )
+
+
+def author_unpulled(author_id):
+    """Заполняет ленты подписчиков автора, опустившегося до порога.
+
+    Пока автор был популярным, его посты не рассылались и читались при
+    запросе ленты. Когда подписчиков становится FEED_FANOUT_LIMIT, посты
+    перестают подмешиваться, и ленты заполняются как при подписке.
+    """
+    if not Counters.objects.filter(
+        user_id=author_id, followers=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        return
+    backfill_many(
+        (user_id, author_id)
+        for user_id in Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild():
+    """Заполняет все ленты заново по текущим подпискам.
+
+    Ленты собираются одним INSERT ... SELECT: для каждой подписки берутся
+    последние FEED_BACKFILL_SIZE постов автора, как в backfill. Строки
+    идут в порядке индекса ленты, так вставка в индексы почти
+    последовательна.
+    """
+    FeedEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedEntry._meta.db_table} '
+            '(user_id, post_id, created) '
+            'SELECT follow.user_id, post.id, post.created '
+            f'FROM {Follow._meta.db_table} follow '
+            'JOIN (SELECT id, author_id, created, ROW_NUMBER() OVER '
+            '(PARTITION BY author_id ORDER BY created DESC) AS position '
+            f'FROM {Post._meta.db_table}) post '
+            'ON post.author_id = follow.author_id '
+            'WHERE post.position <= %s AND follow.author_id NOT IN '
+            f'(SELECT user_id FROM {Counters._meta.db_table} '
+            'WHERE followers > %s) '
+            'ORDER BY follow.user_id, post.id',
+            [settings.FEED_BACKFILL_SIZE, settings.FEED_FANOUT_LIMIT]
+        )
+
+
+def subscribed_groups(user):
+    """Группы из подписок пользователя."""
+    return list(user.group_subscriptions.values_list('group_id', flat=True))
+
+
+def get_feed(user):
+    """Посты ленты подписок пользователя, новые сверху.
+
+    Лента сливается из отсортированных источников: материализованной
+    ленты, постов популярных авторов и постов групп из подписок. Авторы и
+    группы читаются одним запросом на вид источника, так количество
+    запросов не зависит от числа подписок. Пост, пришедший из нескольких
+    источников, выводится один раз.
+    """
+    streams = [
+        Post.objects.filter(feed_entries__user=user).order_by(
+            '-feed_entries__created', '-pk'
+        )
+    ]
+    author_ids = pulled_authors(user)
+    if author_ids:
+        streams.append(Post.objects.filter(author_id__in=author_ids))
+    group_ids = subscribed_groups(user)
+    if group_ids:
+        streams.append(Post.objects.filter(group_id__in=group_ids))
+    return MergedQuerySet(*streams, unique=len(streams) > 1)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации подписок, запускается по cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total = suggestions.compute(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Рекомендаций: {total}'))
@@ -0,0 +1,286 @@
+"""Генератор синтетических данных для нагрузочных замеров.
+
+Все записи вставляются через bulk_create порциями, случайность берётся
+из random.Random(seed), поэтому при одинаковых параметрах получаются
+одни и те же пользователи, тексты и граф подписок. Превью каждой картинки
+из пула нарезаются один раз сразу после вставки постов и записываются
+всем постам с этой картинкой, так что замеры идут по настоящему srcset,
+а не по заглушке. Популярность авторов
+и постов распределена по степенному закону: несколько авторов собирают
+большую часть подписчиков, несколько постов — большую часть комментариев.
+"""
+import io
+import json
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from posts import counters, feed, suggestions, thumbnails, trending
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import get_backend
+
+IMAGES_DIR = 'posts/generated/'
+IMAGE_SIZE = (1200, 800)
+
+WORDS = (
+    'день', 'город', 'дорога', 'книга', 'вечер', 'море', 'лес', 'дом',
+    'друг', 'время', 'история', 'работа', 'музыка', 'солнце', 'ветер',
+    'письмо', 'путь', 'окно', 'сад', 'река', 'утро', 'зима', 'лето',
+    'новый', 'старый', 'тихий', 'светлый', 'долгий', 'важный', 'первый',
+    'читать', 'писать', 'думать', 'ждать', 'идти', 'видеть', 'помнить',
+    'сегодня', 'снова', 'вместе', 'далеко', 'рядом', 'наконец', 'очень',
+)
+
+
+@contextmanager
+def keep_created(*models):
+    """Временно отключает auto_now_add, чтобы сохранить заданные даты."""
+    fields = [model._meta.get_field('created') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для замеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя'
+        )
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.1,
+            help='Доля постов с картинкой'
+        )
+        parser.add_argument(
+            '--image-pool', type=int, default=10,
+            help='Сколько разных картинок нарезать для постов'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до текущего момента распределить даты'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Префикс имён пользователей и адресов групп'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.now = timezone.now()
+        self.period = options['days'] * 24 * 60 * 60
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {self.prefix} уже есть, '
+                'укажите другой --prefix'
+            )
+        users = self.create_users(options['users'])
+        if len(users) < 2:
+            raise CommandError('Нужно хотя бы два пользователя')
+        groups = self.create_groups(options['groups'])
+        images = self.create_images(options['image_pool'])
+        posts = self.create_posts(
+            options['posts'], users, groups, images, options['image_ratio']
+        )
+        self.create_variants(images)
+        self.create_comments(options['comments'], users, posts)
+        self.create_follows(options['follows'], users)
+        self.stdout.write(
+            'Пересчёт счётчиков, лент, поискового индекса, популярного '
+            'и рекомендаций'
+        )
+        counters.rebuild()
+        feed.rebuild()
+        get_backend().rebuild()
+        trending.compute()
+        suggestions.compute()
+        self.stdout.write(self.style.SUCCESS('Данные сгенерированы'))
+
+    def pick(self, items):
+        """Элемент с вероятностью, обратной его месту в списке (Ципф)."""
+        return items[int(len(items) ** self.rng.random()) - 1]
+
+    def created(self):
+        return self.now - timedelta(seconds=self.rng.randrange(self.period))
+
+    def text(self, low, high):
+        words = self.rng.choices(WORDS, k=self.rng.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def insert(self, model, objects):
+        with transaction.atomic():
+            model.objects.bulk_create(objects, ignore_conflicts=True)
+
+    def new_ids(self, model, last_pk):
+        """Ключи вставленных строк в случайном порядке популярности."""
+        ids = array('q', model.objects.filter(pk__gt=last_pk).order_by(
+            'pk'
+        ).values_list('pk', flat=True).iterator())
+        self.rng.shuffle(ids)
+        return ids
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    def create_users(self, count):
+        last_pk = self.last_pk(User)
+        password = make_password(None)
+        for start in range(0, count, self.batch_size):
+            self.insert(User, [
+                User(
+                    username=f'{self.prefix}{number}',
+                    first_name=self.rng.choice(WORDS).capitalize(),
+                    password=password,
+                )
+                for number in range(
+                    start, min(start + self.batch_size, count)
+                )
+            ])
+        self.stdout.write(f'Пользователей: {count}')
+        return self.new_ids(User, last_pk)
+
+    def create_groups(self, count):
+        last_pk = self.last_pk(Group)
+        self.insert(Group, [
+            Group(
+                title=self.text(1, 3)[:-1],
+                slug=f'{self.prefix}-group-{number}',
+                description=self.text(5, 20),
+            )
+            for number in range(count)
+        ])
+        self.stdout.write(f'Групп: {count}')
+        return self.new_ids(Group, last_pk)
+
+    def create_images(self, count):
+        names = []
+        for number in range(count):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            image = Image.new('RGB', IMAGE_SIZE, color)
+            draw = ImageDraw.Draw(image)
+            for _ in range(5):
+                left = self.rng.randrange(IMAGE_SIZE[0])
+                top = self.rng.randrange(IMAGE_SIZE[1])
+                draw.ellipse(
+                    (left, top, left + 300, top + 300),
+                    fill=tuple(self.rng.randrange(256) for _ in range(3))
+                )
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=80)
+            names.append(default_storage.save(
+                f'{IMAGES_DIR}{self.prefix}_{number}.jpg',
+                ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def create_posts(self, count, users, groups, images, image_ratio):
+        last_pk = self.last_pk(Post)
+        with keep_created(Post):
+            for start in range(0, count, self.batch_size):
+                size = min(self.batch_size, count - start)
+                self.insert(Post, [
+                    Post(
+                        author_id=self.pick(users),
+                        text=self.text(10, 80),
+                        group_id=(
+                            self.rng.choice(groups)
+                            if groups and self.rng.random() < 0.7 else None
+                        ),
+                        image=(
+                            self.rng.choice(images)
+                            if images and self.rng.random() < image_ratio
+                            else ''
+                        ),
+                        created=self.created(),
+                    )
+                    for _ in range(size)
+                ])
+                self.stdout.write(f'Постов: {start + size}')
+        return self.new_ids(Post, last_pk)
+
+    def create_variants(self, images):
+        """Нарезает превью картинок пула и раздаёт их постам."""
+        for name in images:
+            post_id = Post.objects.filter(image=name).values_list(
+                'pk', flat=True
+            ).first()
+            if post_id is None:
+                continue
+            variants = thumbnails.generate_variants(post_id)
+            Post.objects.filter(image=name).update(
+                image_variants=json.dumps(variants)
+            )
+        self.stdout.write(f'Превью картинок: {len(images)}')
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+        with keep_created(Comment):
+            for start in range(0, count, self.batch_size):
+                size = min(self.batch_size, count - start)
+                self.insert(Comment, [
+                    Comment(
+                        post_id=self.pick(posts),
+                        author_id=self.rng.choice(users),
+                        text=self.text(3, 30),
+                        created=self.created(),
+                    )
+                    for _ in range(size)
+                ])
+                self.stdout.write(f'Комментариев: {start + size}')
+
+    def create_follows(self, average, users):
+        """Подписки: их число у пользователя и выбор авторов — по Парето."""
+        batch, total = [], 0
+        with keep_created(Follow):
+            for user_id in users:
+                # Среднее распределения Парето с alpha=1.5 равно 3
+                wanted = min(
+                    int(self.rng.paretovariate(1.5) * average / 3),
+                    len(users) - 1
+                )
+                authors = set()
+                for _ in range(wanted * 3):
+                    if len(authors) >= wanted:
+                        break
+                    author_id = self.pick(users)
+                    if author_id != user_id:
+                        authors.add(author_id)
+                batch.extend(
+                    Follow(
+                        user_id=user_id, author_id=author_id,
+                        created=self.created()
+                    )
+                    for author_id in authors
+                )
+                if len(batch) >= self.batch_size:
+                    self.insert(Follow, batch)
+                    total += len(batch)
+                    batch = []
+            self.insert(Follow, batch)
+        total += len(batch)
+        self.stdout.write(f'Подписок: {total}')
@@ -0,0 +1,71 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:21
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    """Удаляет подписки на себя и повторы.
+
+    Счётчики и ленты уже заполнены миграциями 0012 и 0013 с учётом этих
+    подписок, поэтому счётчики затронутых пользователей пересчитываются,
+    а посты из подписок на себя убираются из лент.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    Counters = apps.get_model('posts', 'Counters')
+    affected = set()
+    self_follows = Follow.objects.filter(user=models.F('author'))
+    affected.update(self_follows.values_list('user', flat=True))
+    self_follows.delete()
+    FeedEntry.objects.filter(user=models.F('post__author')).delete()
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        first_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1)
+    for row in duplicates:
+        affected.update((row['user'], row['author']))
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(id=row['first_id']).delete()
+    for user_id in affected:
+        Counters.objects.filter(user_id=user_id).update(
+            followers=Follow.objects.filter(author_id=user_id).count(),
+            following=Follow.objects.filter(user_id=user_id).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created'], name='post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-created'], name='post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-created'], name='post_group_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='prevent_self_follow'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+        'text, comments, grp, author, tokenize="unicode61")'
+    )
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comments = {}
+    for post_id, text in Comment.objects.values_list('post_id', 'text'):
+        comments.setdefault(post_id, []).append(text)
+    posts = Post.objects.select_related('author', 'group')
+    for post in posts.iterator():
+        full_name = f'{post.author.first_name} {post.author.last_name}'
+        schema_editor.execute(
+            'INSERT INTO posts_search (rowid, text, comments, grp, author) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            (
+                post.pk,
+                post.text,
+                '\n'.join(comments.get(post.pk, ())),
+                post.group.title if post.group else '',
+                f'{post.author.username} {full_name.strip()}'.strip(),
+            )
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0020_group_subscriptions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='counters',
+            name='notifications',
+            field=models.PositiveIntegerField(default=0, verbose_name='Непрочитанных уведомлений'),
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('comment', 'Комментарии к посту'), ('follow', 'Новые подписчики')], max_length=16, verbose_name='Событие')),
+                ('count', models.PositiveIntegerField(default=1, verbose_name='Событий')),
+                ('unread', models.BooleanField(default=True, verbose_name='Не прочитано')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата последнего события')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор последнего события')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='Получатель')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created'], name='notification_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_notifications'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(unread=True), fields=('user', 'kind', 'post'), name='unique_unread_notification'),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('post__isnull', True), ('unread', True)), fields=('user', 'kind'), name='unique_unread_postless_notification'),
+        ),
+    ]
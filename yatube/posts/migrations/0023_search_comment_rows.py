@@ -0,0 +1,62 @@
+from importlib import import_module
+
+from django.db import migrations
+
+
+def split_comments(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        'text, grp, author, tokenize="unicode61")'
+    )
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search_comments USING '
+        'fts5(post_id UNINDEXED, text, tokenize="unicode61")'
+    )
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    posts = Post.objects.select_related('author', 'group')
+    for post in posts.iterator():
+        full_name = f'{post.author.first_name} {post.author.last_name}'
+        schema_editor.execute(
+            'INSERT INTO posts_search (rowid, text, grp, author) '
+            'VALUES (%s, %s, %s, %s)',
+            (
+                post.pk,
+                post.text,
+                post.group.title if post.group else '',
+                f'{post.author.username} {full_name.strip()}'.strip(),
+            )
+        )
+    comments = Comment.objects.filter(post__isnull=False).values_list(
+        'pk', 'post_id', 'text'
+    )
+    for row in comments.iterator():
+        schema_editor.execute(
+            'INSERT INTO posts_search_comments (rowid, post_id, text) '
+            'VALUES (%s, %s, %s)',
+            row
+        )
+
+
+def join_comments(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS posts_search_comments')
+    schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+    import_module(
+        'posts.migrations.0016_search_index'
+    ).create_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_notification_unique_unread'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_comments, join_comments),
+    ]
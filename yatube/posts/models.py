@@ -1,6 +1,9 @@
+import json
+
 from core.models import CreatedModel
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -14,7 +17,38 @@ class Group(models.Model):
         return self.title
 
 
-class Post(CreatedModel):
+class PostImagesMixin:
+    """Превью картинки для постов и архивных постов."""
+    is_archived = False
+
+    @property
+    def variants(self):
+        """Пути к готовым превью картинки."""
+        return json.loads(self.image_variants) if self.image_variants else {}
+
+    @property
+    def card_url(self):
+        name = self.variants.get('card')
+        return self.image.storage.url(name) if name else ''
+
+    @property
+    def image_sources(self):
+        """Пары (MIME-тип, srcset) для тегов <source> внутри <picture>."""
+        sources = []
+        for label in ('avif', 'webp'):
+            widths = self.variants.get(label)
+            if widths:
+                srcset = ', '.join(
+                    f'{self.image.storage.url(name)} {width}w'
+                    for width, name in sorted(
+                        widths.items(), key=lambda item: int(item[0])
+                    )
+                )
+                sources.append((f'image/{label}', srcset))
+        return sources
+
+
+class Post(PostImagesMixin, CreatedModel):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста'
@@ -40,9 +74,29 @@ class Post(CreatedModel):
         null=True,
         help_text='Загрузите картинку'
     )
+    image_variants = models.TextField(
+        'Превью картинки',
+        blank=True,
+        default='',
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['-created'], name='post_created_idx'),
+            models.Index(
+                fields=['author', '-created'], name='post_author_created_idx'
+            ),
+            models.Index(
+                fields=['group', '-created'], name='post_group_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -67,6 +121,11 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comment_post_created_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -87,3 +146,268 @@ class Follow(models.Model):
         blank=True,
         null=True
     )
+    created = models.DateTimeField('Дата подписки', auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['author', 'created'], name='follow_author_created_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow'
+            ),
+        ]
+
+
+class GroupSubscription(models.Model):
+    """Подписка пользователя на группу, её посты попадают в ленту."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='group_subscriptions',
+        verbose_name='Подписчик'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='subscriptions',
+        verbose_name='Группа'
+    )
+    created = models.DateTimeField('Дата подписки', auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'group'], name='unique_group_subscription'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    created = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-created']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created']),
+        ]
+
+
+class Counters(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts = models.PositiveIntegerField('Постов', default=0)
+    followers = models.PositiveIntegerField('Подписчиков', default=0)
+    following = models.PositiveIntegerField('Подписок', default=0)
+    notifications = models.PositiveIntegerField(
+        'Непрочитанных уведомлений', default=0
+    )
+
+
+class ArchivedPost(PostImagesMixin, models.Model):
+    """Пост, перенесённый в архив командой archive_posts.
+
+    Первичный ключ совпадает с прежним, поэтому адрес поста не меняется.
+    """
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True)
+    created = models.DateTimeField('Дата создания')
+    text = models.TextField('Текст поста')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор'
+    )
+    group = models.ForeignKey(
+        Group,
+        verbose_name='Группа',
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        blank=True,
+        null=True
+    )
+    image = models.ImageField(
+        'Картинка', upload_to='posts/', blank=True, null=True
+    )
+    image_variants = models.TextField('Превью картинки', blank=True)
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0
+    )
+    archived = models.DateTimeField('Дата архивации', auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['author', '-created'],
+                name='archived_author_created_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
+
+
+class ArchivedComment(models.Model):
+    """Комментарий архивного поста."""
+    id = models.IntegerField(primary_key=True)
+    created = models.DateTimeField('Дата создания')
+    text = models.TextField()
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name='Автор'
+    )
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='archived_comment_post_idx'
+            ),
+        ]
+
+
+class TrendingScore(models.Model):
+    """Оценка поста в рейтинге популярного, см. posts.trending."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Пост'
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация подписки, см. posts.suggestions."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендуемый автор'
+    )
+    mutual = models.PositiveIntegerField('Подписаны из подписок', default=0)
+    groups = models.PositiveIntegerField('Общих групп', default=0)
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        ordering = ['-score']
+        unique_together = ('user', 'author')
+        indexes = [
+            models.Index(
+                fields=['user', '-score'], name='suggestion_user_score_idx'
+            ),
+        ]
+
+
+class Notification(models.Model):
+    """Уведомление о комментариях к посту или новых подписчиках.
+
+    Повторные события схлопываются в непрочитанное уведомление: растёт
+    count, а created сдвигается на время последнего события. Непрочитанное
+    уведомление одно на получателя, событие и пост, у подписок поста нет.
+    """
+    COMMENT = 'comment'
+    FOLLOW = 'follow'
+    KINDS = (
+        (COMMENT, 'Комментарии к посту'),
+        (FOLLOW, 'Новые подписчики'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель'
+    )
+    kind = models.CharField('Событие', max_length=16, choices=KINDS)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Пост',
+        blank=True,
+        null=True
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор последнего события'
+    )
+    count = models.PositiveIntegerField('Событий', default=1)
+    unread = models.BooleanField('Не прочитано', default=True)
+    created = models.DateTimeField(
+        'Дата последнего события', default=timezone.now
+    )
+
+    class Meta:
+        ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['user', '-created'],
+                name='notification_user_created_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'kind', 'post'],
+                condition=models.Q(unread=True),
+                name='unique_unread_notification'
+            ),
+            models.UniqueConstraint(
+                fields=['user', 'kind'],
+                condition=models.Q(unread=True, post__isnull=True),
+                name='unique_unread_postless_notification'
+            ),
+        ]
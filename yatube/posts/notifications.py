@@ -0,0 +1,202 @@
+"""Уведомления о комментариях и новых подписчиках.
+
+Запрос не пишет уведомления в базу: после фиксации транзакции событие
+попадает в буфер процесса, а фоновый поток доставляет буфер пачкой, когда
+в нём наберётся NOTIFICATION_BATCH_SIZE событий или пройдёт
+NOTIFICATION_FLUSH_SECONDS с первого. Повторные события схлопываются в
+одно непрочитанное уведомление, число непрочитанных хранится в Counters.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from core import sqlite
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import (IntegrityError, OperationalError,
+                       close_old_connections, transaction)
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Counters, Notification, Post
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+# Сколько ключей уведомлений ищется одним запросом: SQLite ограничивает
+# глубину дерева условий, а ключи соединяются через OR
+LOOKUP_CHUNK_SIZE = 200
+
+_lock = threading.Lock()
+_pending = []
+_timer = None
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='notifications'
+        )
+    return _executor
+
+
+def _live(events):
+    """События, чьи получатель, автор и пост ещё существуют."""
+    user_ids = {user_id for user_id, _, _, _ in events} | {
+        actor_id for _, _, _, actor_id in events
+    }
+    post_ids = {post_id for _, _, post_id, _ in events if post_id}
+    users = set(
+        User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+    )
+    posts = set(
+        Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True)
+    ) if post_ids else set()
+    return [
+        (user_id, kind, post_id, actor_id)
+        for user_id, kind, post_id, actor_id in events
+        if user_id in users and actor_id in users
+        and (post_id is None or post_id in posts)
+    ]
+
+
+def _unread(keys):
+    """Непрочитанные уведомления с ключами (получатель, вид, пост)."""
+    keys = list(keys)
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        condition = Q()
+        for user_id, kind, post_id in keys[start:start + LOOKUP_CHUNK_SIZE]:
+            condition |= Q(user_id=user_id, kind=kind, post_id=post_id)
+        yield from Notification.objects.filter(condition, unread=True)
+
+
+@transaction.atomic
+def deliver(events):
+    """Записывает пачку событий (получатель, вид, пост, автор события).
+
+    События об удалённых за время ожидания постах и пользователях
+    отбрасываются. Возвращает число затронутых уведомлений.
+    """
+    grouped = {}
+    for user_id, kind, post_id, actor_id in _live(list(events)):
+        count, _ = grouped.get((user_id, kind, post_id), (0, None))
+        grouped[user_id, kind, post_id] = (count + 1, actor_id)
+    if not grouped:
+        return 0
+    existing = {
+        (notification.user_id, notification.kind, notification.post_id):
+            notification
+        for notification in _unread(grouped)
+    }
+    now = timezone.now()
+    updated, created, unread = [], [], defaultdict(int)
+    for key, (count, actor_id) in grouped.items():
+        notification = existing.get(key)
+        if notification is None:
+            user_id, kind, post_id = key
+            created.append(Notification(
+                user_id=user_id, kind=kind, post_id=post_id,
+                actor_id=actor_id, count=count, created=now
+            ))
+            unread[user_id] += 1
+        else:
+            notification.count += count
+            notification.actor_id = actor_id
+            notification.created = now
+            updated.append(notification)
+    Notification.objects.bulk_update(updated, ['count', 'actor', 'created'])
+    Notification.objects.bulk_create(created)
+    by_delta = defaultdict(list)
+    for user_id, delta in unread.items():
+        by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        Counters.objects.filter(user_id__in=user_ids).update(
+            notifications=F('notifications') + delta
+        )
+    return len(grouped)
+
+
+def _deliver(events):
+    """Доставляет события с повторами, ошибки только пишет в журнал.
+
+    Блокировка SQLite и вставка уведомления, которое параллельно создал
+    другой процесс, повторяют доставку в новой транзакции.
+    """
+    attempts = settings.SQLITE_WRITE_RETRIES
+    try:
+        for attempt in range(attempts + 1):
+            try:
+                return deliver(events)
+            except IntegrityError:
+                if attempt == attempts:
+                    raise
+            except OperationalError as error:
+                if attempt == attempts or not sqlite.is_locked(error):
+                    raise
+                sqlite.backoff(attempt)
+    except Exception:
+        logger.exception('Не удалось доставить уведомлений: %s', len(events))
+    return 0
+
+
+def flush():
+    """Доставляет накопленные события. Возвращает их число."""
+    global _timer
+    with _lock:
+        events = _pending[:]
+        _pending.clear()
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if not events:
+        return 0
+    try:
+        _deliver(events)
+    finally:
+        close_old_connections()
+    return len(events)
+
+
+def _submit_flush():
+    _get_executor().submit(flush)
+
+
+def _enqueue(events):
+    global _timer
+    with _lock:
+        _pending.extend(events)
+        if len(_pending) >= settings.NOTIFICATION_BATCH_SIZE:
+            _submit_flush()
+        elif _timer is None:
+            _timer = threading.Timer(
+                settings.NOTIFICATION_FLUSH_SECONDS, _submit_flush
+            )
+            _timer.daemon = True
+            _timer.start()
+
+
+def send(events):
+    """Ставит события (получатель, вид, пост, автор события) в очередь
+    доставки после фиксации транзакции. О своих действиях не уведомляет.
+    """
+    events = [event for event in events if event[0] != event[3]]
+    if not events:
+        return
+    if settings.NOTIFICATIONS_ASYNC:
+        transaction.on_commit(lambda: _enqueue(events))
+    else:
+        transaction.on_commit(lambda: _deliver(events))
+
+
+def notify(user_id, kind, actor_id, post_id=None):
+    """Ставит событие в очередь доставки после фиксации транзакции."""
+    send([(user_id, kind, post_id, actor_id)])
+
+
+# Остаток буфера доставляется при остановке воркера
+atexit.register(flush)
@@ -0,0 +1,307 @@
+"""Полнотекстовый поиск по постам.
+
+В индекс попадает документ на каждый пост: текст поста, название группы
+и имя автора, а каждый комментарий хранится отдельной строкой, чтобы новый
+комментарий не пересобирал документ поста. Бэкенд выбирается настройкой
+SEARCH_BACKEND. Результаты упорядочены по (score, id) по возрастанию,
+что позволяет листать их курсором без OFFSET.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+from .utils import (BACKWARD, FORWARD, NUMBER_OF_POSTS_DISPLAYED,
+                    CursorPage, decode_token, encode_token)
+
+TERM = re.compile(r'\w+')
+
+
+def terms(query):
+    return TERM.findall(query.lower())
+
+
+class SearchBackend:
+    """Интерфейс поискового бэкенда."""
+
+    def index_posts(self, post_ids):
+        """Добавляет или обновляет документы постов."""
+        raise NotImplementedError
+
+    def remove_posts(self, post_ids):
+        """Удаляет документы постов вместе с их комментариями."""
+        raise NotImplementedError
+
+    def index_comments(self, comments):
+        """Добавляет или обновляет комментарии."""
+        raise NotImplementedError
+
+    def remove_comments(self, comment_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Строит индекс заново по всем постам."""
+        raise NotImplementedError
+
+    def search(self, query, after=None, limit=NUMBER_OF_POSTS_DISPLAYED,
+               backward=False):
+        """Возвращает до limit пар (score, post_id) после позиции after."""
+        raise NotImplementedError
+
+
+class SimpleBackend(SearchBackend):
+    """Поиск через LIKE без индекса, для баз без полнотекстового поиска.
+
+    Вместо релевантности результаты упорядочены от новых постов к старым.
+    """
+
+    def index_posts(self, post_ids):
+        pass
+
+    def remove_posts(self, post_ids):
+        pass
+
+    def index_comments(self, comments):
+        pass
+
+    def remove_comments(self, comment_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, after=None, limit=NUMBER_OF_POSTS_DISPLAYED,
+               backward=False):
+        posts = Post.objects.all()
+        for term in terms(query):
+            posts = posts.filter(
+                Q(text__icontains=term)
+                | Q(group__title__icontains=term)
+                | Q(author__username__icontains=term)
+                | Q(author__first_name__icontains=term)
+                | Q(author__last_name__icontains=term)
+                | Q(pk__in=Comment.objects.filter(
+                    text__icontains=term
+                ).values('post_id'))
+            )
+        if after is not None:
+            pk = after[1]
+            posts = posts.filter(pk__gt=pk) if backward else posts.filter(
+                pk__lt=pk
+            )
+        ids = posts.order_by('pk' if backward else '-pk').values_list(
+            'pk', flat=True
+        )[:limit]
+        results = [(-pk, pk) for pk in ids]
+        return results[::-1] if backward else results
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Инвертированный индекс на виртуальных таблицах SQLite FTS5.
+
+    Каждое слово запроса ищется в постах и комментариях отдельно: пост
+    найден, если каждое слово есть в нём или в одном из его комментариев.
+    Оценка поста складывается из лучших оценок по каждому слову.
+    """
+    table = 'posts_search'
+    comments_table = 'posts_search_comments'
+    # Веса столбцов text, grp, author для ранжирования bm25
+    weights = (10.0, 4.0, 4.0)
+    # Вес текста комментария, столбец post_id не индексируется
+    comment_weights = (0.0, 2.0)
+
+    def _documents(self, posts):
+        for post in posts.select_related('author', 'group'):
+            yield (
+                post.pk,
+                post.text,
+                post.group.title if post.group else '',
+                ' '.join(filter(None, (
+                    post.author.username,
+                    post.author.get_full_name()
+                ))),
+            )
+
+    def _insert(self, posts):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, text, grp, author) '
+                'VALUES (%s, %s, %s, %s)',
+                list(self._documents(posts))
+            )
+
+    def _delete(self, table, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE rowid IN ({placeholders})', ids
+            )
+
+    def index_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        self._delete(self.table, post_ids)
+        self._insert(Post.objects.filter(pk__in=post_ids))
+
+    def remove_posts(self, post_ids):
+        """Удаляет документы постов.
+
+        Комментарии находятся по базе, поэтому вызывается до их удаления.
+        """
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        self._delete(self.table, post_ids)
+        self._delete(self.comments_table, Comment.objects.filter(
+            post_id__in=post_ids
+        ).values_list('pk', flat=True))
+
+    def index_comments(self, comments):
+        rows = [
+            (comment.pk, comment.post_id, comment.text)
+            for comment in comments if comment.post_id
+        ]
+        if not rows:
+            return
+        self._delete(self.comments_table, [row[0] for row in rows])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.comments_table} (rowid, post_id, text) '
+                'VALUES (%s, %s, %s)',
+                rows
+            )
+
+    def remove_comments(self, comment_ids):
+        self._delete(self.comments_table, comment_ids)
+
+    @transaction.atomic
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(f'DELETE FROM {self.comments_table}')
+        ids = list(Post.objects.values_list('pk', flat=True))
+        for start in range(0, len(ids), 500):
+            self._insert(Post.objects.filter(pk__in=ids[start:start + 500]))
+        comments = Comment.objects.filter(post__isnull=False).only(
+            'pk', 'post_id', 'text'
+        ).order_by('pk')
+        batch = []
+        for comment in comments.iterator(chunk_size=500):
+            batch.append(comment)
+            if len(batch) == 500:
+                self.index_comments(batch)
+                batch = []
+        self.index_comments(batch)
+
+    def search(self, query, after=None, limit=NUMBER_OF_POSTS_DISPLAYED,
+               backward=False):
+        words = terms(query)
+        if not words:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        comment_weights = ', '.join(
+            str(weight) for weight in self.comment_weights
+        )
+        hits, params = [], []
+        for term, word in enumerate(words):
+            # Лучшее совпадение слова в посте и в его комментариях.
+            # LIMIT -1 не даёт SQLite встроить bm25 в агрегирующий запрос
+            hits.append(
+                f'SELECT * FROM (SELECT rowid AS post_id, {term} AS term, '
+                f'bm25({self.table}, {weights}) AS score FROM {self.table} '
+                f'WHERE {self.table} MATCH %s LIMIT -1)'
+            )
+            hits.append(
+                f'SELECT post_id, {term}, MIN(score) FROM (SELECT '
+                f'post_id, bm25({self.comments_table}, {comment_weights}) '
+                f'AS score FROM {self.comments_table} '
+                f'WHERE {self.comments_table} MATCH %s LIMIT -1) '
+                'GROUP BY post_id'
+            )
+            params += [f'"{word}"*', f'"{word}"*']
+        sql = (
+            'SELECT score, post_id FROM (SELECT post_id, SUM(score) AS '
+            f'score FROM ({" UNION ALL ".join(hits)}) GROUP BY post_id '
+            'HAVING COUNT(DISTINCT term) = %s)'
+        )
+        params.append(len(words))
+        if after is not None:
+            sign = '<' if backward else '>'
+            sql += (
+                f' WHERE score {sign} %s OR (score = %s AND post_id {sign} %s)'
+            )
+            params += [after[0], after[0], after[1]]
+        order = 'DESC' if backward else 'ASC'
+        sql += f' ORDER BY score {order}, post_id {order} LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            results = cursor.fetchall()
+        return results[::-1] if backward else results
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.SEARCH_BACKEND)()
+    return _backend
+
+
+def _cursor(result, direction):
+    return encode_token([result[0], result[1], direction])
+
+
+def _valid_cursor(cursor):
+    """Курсор вида [оценка, id поста, направление]."""
+    return (
+        isinstance(cursor, list) and len(cursor) == 3
+        and isinstance(cursor[0], (int, float))
+        and not isinstance(cursor[0], bool)
+        and isinstance(cursor[1], int) and not isinstance(cursor[1], bool)
+        and cursor[2] in (FORWARD, BACKWARD)
+    )
+
+
+def search_page(query, token=None, per_page=NUMBER_OF_POSTS_DISPLAYED):
+    """Страница найденных постов в порядке релевантности.
+
+    Испорченный курсор открывает первую страницу.
+    """
+    backend = get_backend()
+    cursor = decode_token(token) if token else None
+    if not _valid_cursor(cursor):
+        cursor = None
+    backward = cursor is not None and cursor[2] == BACKWARD
+    results = backend.search(
+        query, after=cursor, limit=per_page + 1, backward=backward
+    )
+    has_more = len(results) > per_page
+    if backward:
+        results = results[-per_page:]
+        has_next, has_previous = True, has_more
+    else:
+        results = results[:per_page]
+        has_next, has_previous = has_more, cursor is not None
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for _, post_id in results]
+    )
+    return CursorPage(
+        [posts[post_id] for _, post_id in results if post_id in posts],
+        next_cursor=(
+            _cursor(results[-1], FORWARD) if has_next and results else None
+        ),
+        previous_cursor=(
+            _cursor(results[0], BACKWARD)
+            if has_previous and results else None
+        ),
+    )
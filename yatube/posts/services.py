@@ -0,0 +1,287 @@
+"""Пакетное создание постов, комментариев и подписок.
+
+Каждая запись проверяется по правилам тех же форм, что и в views, но
+справочники (авторы, группы, посты) загружаются один раз на всю пачку.
+Если хотя бы одна запись не прошла проверку, ничего не сохраняется.
+Пачка сохраняется в одной транзакции через bulk_create порциями по
+CHUNK_SIZE. bulk_create не отправляет сигналы, поэтому счётчики, ленты
+и поисковый индекс обновляются здесь же одним проходом на порцию, а
+версии кэша сбрасываются после фиксации.
+"""
+from collections import Counter
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+
+from . import caching, counters, feed, notifications
+from .forms import CommentForm, PostForm
+from .models import Comment, Follow, Group, Notification, Post, User
+from .search import get_backend as search_backend
+
+CHUNK_SIZE = 500
+
+
+class PreloadedChoiceField(forms.ModelChoiceField):
+    """Выбор объекта из заранее загруженного словаря {pk: объект}."""
+
+    def __init__(self, objects, **kwargs):
+        super().__init__(queryset=None, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice'
+            )
+
+
+class BulkPostForm(PostForm):
+    """PostForm, не обращающаяся к базе за группой на каждую запись."""
+
+    def __init__(self, *args, groups, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields['group']
+        self.fields['group'] = PreloadedChoiceField(
+            groups,
+            required=field.required,
+            label=field.label,
+            help_text=field.help_text
+        )
+
+    def _get_validation_exclusions(self):
+        # Группа уже найдена среди загруженных, повторный запрос модели
+        # на проверку внешнего ключа не нужен
+        return super()._get_validation_exclusions() + ['group']
+
+
+def _errors(form):
+    return {
+        field: [error['message'] for error in errors]
+        for field, errors in form.errors.get_json_data().items()
+    }
+
+
+def _users(items, *fields):
+    """Пользователи по именам из полей fields всех записей."""
+    usernames = {item.get(field) for item in items for field in fields}
+    return User.objects.in_bulk(
+        [name for name in usernames if isinstance(name, str)],
+        field_name='username'
+    )
+
+
+def _user(users, item, field):
+    username = item.get(field)
+    return users.get(username) if isinstance(username, str) else None
+
+
+def _chunks(objects):
+    objects = list(objects)
+    for start in range(0, len(objects), CHUNK_SIZE):
+        yield objects[start:start + CHUNK_SIZE]
+
+
+def _existing_follows(user_ids):
+    """Пары (user_id, author_id) уже существующих подписок пользователей."""
+    existing = set()
+    for chunk in _chunks(user_ids):
+        existing.update(Follow.objects.filter(
+            user_id__in=chunk
+        ).values_list('user_id', 'author_id'))
+    return existing
+
+
+def _bulk_insert(model, objects):
+    """bulk_create, после которого у объектов заполнены первичные ключи.
+
+    SQLite не возвращает ключи вставленных строк, но держит блокировку
+    записи до фиксации транзакции: никто другой не вставит строки, и
+    последние len(objects) ключей таблицы принадлежат только что
+    вставленным. На остальных базах без возврата ключей строки
+    вставляются по одной, и ключ каждой берётся у драйвера.
+    """
+    if connection.features.can_return_ids_from_bulk_insert:
+        model.objects.bulk_create(objects)
+    elif connection.vendor == 'sqlite':
+        model.objects.bulk_create(objects)
+        pks = list(model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:len(objects)])
+        for obj, pk in zip(objects, reversed(pks)):
+            obj.pk = pk
+    else:
+        fields = [
+            field for field in model._meta.concrete_fields
+            if not isinstance(field, models.AutoField)
+        ]
+        for obj in objects:
+            obj.pk = model._base_manager._insert(
+                [obj], fields=fields, return_id=True
+            )
+
+
+def prepare_posts(items):
+    """Проверяет записи постов {'author', 'text', 'group'}.
+
+    Возвращает несохранённые посты и ошибки по номерам записей.
+    """
+    users = _users(items, 'author')
+    groups = Group.objects.in_bulk()
+    posts, errors = [], {}
+    for index, item in enumerate(items):
+        form = BulkPostForm(item, groups=groups)
+        author = _user(users, item, 'author')
+        if author is None:
+            form.add_error(None, 'Автор не найден')
+        if form.is_valid():
+            post = form.save(commit=False)
+            post.author = author
+            posts.append(post)
+        else:
+            errors[index] = _errors(form)
+    return posts, errors
+
+
+@transaction.atomic
+def save_posts(posts):
+    backend = search_backend()
+    namespaces = {caching.INDEX}
+    for chunk in _chunks(posts):
+        _bulk_insert(Post, chunk)
+        for author_id, total in Counter(
+            post.author_id for post in chunk
+        ).items():
+            counters.change_user(author_id, posts=total)
+        feed.fan_out_many(chunk)
+        backend.index_posts([post.pk for post in chunk])
+        for post in chunk:
+            namespaces.add(caching.profile(post.author_id))
+            if post.group_id:
+                namespaces.add(caching.group(post.group_id))
+    transaction.on_commit(lambda: caching.touch(*namespaces))
+    return posts
+
+
+def prepare_comments(items):
+    """Проверяет записи комментариев {'author', 'post', 'text'}."""
+    users = _users(items, 'author')
+    post_ids = set(Post.objects.only('pk').in_bulk({
+        item.get('post') for item in items
+        if isinstance(item.get('post'), int)
+    }))
+    comments, errors = [], {}
+    for index, item in enumerate(items):
+        form = CommentForm(item)
+        author = _user(users, item, 'author')
+        if author is None:
+            form.add_error(None, 'Автор не найден')
+        post_id = item.get('post')
+        if not isinstance(post_id, int) or post_id not in post_ids:
+            form.add_error(None, 'Пост не найден')
+        if form.is_valid():
+            comment = form.save(commit=False)
+            comment.author = author
+            comment.post_id = post_id
+            comments.append(comment)
+        else:
+            errors[index] = _errors(form)
+    return comments, errors
+
+
+@transaction.atomic
+def save_comments(comments):
+    backend = search_backend()
+    namespaces = set()
+    for chunk in _chunks(comments):
+        post_ids = Counter(comment.post_id for comment in chunk)
+        _bulk_insert(Comment, chunk)
+        for post_id, total in post_ids.items():
+            counters.change_comments(post_id, total)
+        post_authors = dict(
+            Post.objects.filter(pk__in=post_ids).values_list('pk', 'author_id')
+        )
+        notifications.send(
+            (
+                post_authors[comment.post_id], Notification.COMMENT,
+                comment.post_id, comment.author_id
+            )
+            for comment in chunk
+        )
+        backend.index_comments(chunk)
+        namespaces.update(caching.post(post_id) for post_id in post_ids)
+    transaction.on_commit(lambda: caching.touch(*namespaces))
+    return comments
+
+
+def prepare_follows(items):
+    """Проверяет записи подписок {'user', 'author'}.
+
+    Уже существующие и повторяющиеся подписки пропускаются, как и в
+    profile_follow.
+    """
+    users = _users(items, 'user', 'author')
+    existing = _existing_follows({
+        user.pk for user in (_user(users, item, 'user') for item in items)
+        if user is not None
+    })
+    follows, errors = [], {}
+    for index, item in enumerate(items):
+        user = _user(users, item, 'user')
+        author = _user(users, item, 'author')
+        if user is None or author is None:
+            errors[index] = {'__all__': ['Пользователь не найден']}
+        elif user == author:
+            errors[index] = {'__all__': ['Нельзя подписаться на себя']}
+        elif (user.pk, author.pk) not in existing:
+            existing.add((user.pk, author.pk))
+            follows.append(Follow(user=user, author=author))
+    return follows, errors
+
+
+@transaction.atomic
+def save_follows(follows):
+    for chunk in _chunks(follows):
+        _bulk_insert(Follow, chunk)
+        deltas = {}
+        for follow in chunk:
+            author = deltas.setdefault(follow.author_id, Counter())
+            author['followers'] += 1
+            user = deltas.setdefault(follow.user_id, Counter())
+            user['following'] += 1
+        for user_id, delta in deltas.items():
+            counters.change_user(user_id, **delta)
+        feed.backfill_many(
+            (follow.user_id, follow.author_id) for follow in chunk
+        )
+        notifications.send(
+            (follow.author_id, Notification.FOLLOW, None, follow.user_id)
+            for follow in chunk
+        )
+    return follows
+
+
+def create_posts(items):
+    """Создаёт посты пачкой. Возвращает посты и ошибки проверки."""
+    posts, errors = prepare_posts(items)
+    if errors:
+        return [], errors
+    return save_posts(posts), {}
+
+
+def create_comments(items):
+    comments, errors = prepare_comments(items)
+    if errors:
+        return [], errors
+    return save_comments(comments), {}
+
+
+def create_follows(items):
+    follows, errors = prepare_follows(items)
+    if errors:
+        return [], errors
+    return save_follows(follows), {}
@@ -0,0 +1,148 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import caching, counters, feed, notifications
+from .search import get_backend as search_backend
+from .models import (Comment, Counters, Follow, Group, Notification, Post,
+                     User)
+
+
+# Поля пользователя, которые выводятся на карточках и попадают в поиск
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields, **kwargs):
+    """Запоминает прежние имя и логин редактируемого пользователя."""
+    instance._old_author_fields = None
+    if update_fields is not None and not set(update_fields) & set(
+        AUTHOR_FIELDS
+    ):
+        # Например, вход обновляет только last_login
+        instance._old_author_fields = tuple(
+            getattr(instance, field) for field in AUTHOR_FIELDS
+        )
+    elif instance.pk:
+        instance._old_author_fields = User.objects.filter(
+            pk=instance.pk
+        ).values_list(*AUTHOR_FIELDS).first()
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    """Вычитает непрочитанные уведомления о действиях пользователя."""
+    counters.notifications_removed(
+        Notification.objects.filter(actor=instance)
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """Заводит счётчики новому пользователю.
+
+    Кэш и поисковый индекс постов обновляются, только если изменились имя
+    или логин: смена пароля или входа их не касается.
+    """
+    if created:
+        Counters.objects.get_or_create(user=instance)
+        return
+    current = tuple(getattr(instance, field) for field in AUTHOR_FIELDS)
+    if current != getattr(instance, '_old_author_fields', None):
+        caching.author_changed(instance)
+        search_backend().index_posts(
+            instance.posts.values_list('pk', flat=True)
+        )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    """Запоминает прежнюю группу редактируемого поста."""
+    instance._old_group_id = None
+    if instance.pk:
+        instance._old_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """Учитывает новый пост и рассылает его по лентам подписчиков."""
+    if created:
+        with transaction.atomic():
+            counters.change_user(instance.author_id, posts=1)
+            feed.fan_out(instance)
+    caching.post_changed(instance, getattr(instance, '_old_group_id', None))
+    search_backend().index_posts([instance.pk])
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """Вычитает непрочитанные уведомления о посте, их удалит каскад."""
+    counters.notifications_removed(instance.notifications.all())
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, posts=-1)
+    caching.post_changed(instance)
+    search_backend().remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        counters.change_comments(instance.post_id, 1)
+        notifications.notify(
+            instance.post.author_id, Notification.COMMENT,
+            instance.author_id, instance.post_id
+        )
+    caching.comment_changed(instance)
+    search_backend().index_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.change_comments(instance.post_id, -1)
+    caching.comment_changed(instance)
+    search_backend().remove_comments([instance.pk])
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    """Запоминает посты группы, у которых после удаления сбросится группа."""
+    instance._post_ids = list(instance.groups.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    caching.group_changed(instance)
+    post_ids = getattr(instance, '_post_ids', None)
+    if post_ids is None:
+        post_ids = instance.groups.values_list('pk', flat=True)
+    search_backend().index_posts(post_ids)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    """Учитывает подписку, заполняет ленту и уведомляет автора."""
+    if created and instance.user_id and instance.author_id:
+        with transaction.atomic():
+            counters.follow_changed(instance, 1)
+            feed.backfill(instance.user_id, instance.author_id)
+            notifications.notify(
+                instance.author_id, Notification.FOLLOW, instance.user_id
+            )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Учитывает отписку и убирает посты автора из ленты."""
+    if instance.user_id and instance.author_id:
+        with transaction.atomic():
+            counters.follow_changed(instance, -1)
+            feed.trim(instance.user_id, instance.author_id)
+            feed.author_unpulled(instance.author_id)
@@ -0,0 +1,22 @@
+from django import template
+
+from posts.utils import FORWARD, encode_cursor
+
+register = template.Library()
+
+
+@register.filter
+def page_window(page):
+    """Номера страниц для ссылок, на длинных списках с пропусками."""
+    paginator = page.paginator
+    if hasattr(paginator, 'get_elided_page_range'):
+        return paginator.get_elided_page_range(page.number)
+    return paginator.page_range
+
+
+@register.filter
+def continue_cursor(page):
+    """Курсор за последней страницей списка с ограниченной глубиной."""
+    if page.has_next() or not getattr(page.paginator, 'truncated', False):
+        return ''
+    return encode_cursor(page[-1], FORWARD)
@@ -0,0 +1,54 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import db_router
+from posts import caching
+
+register = template.Library()
+
+CARD_PREFIX = 'posts:card:'
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Разметка карточек постов, каждая кэшируется отдельно.
+
+    Версия карточки складывается из версий поста, его автора и группы,
+    так что правка поста, его картинки, группы или имени автора её
+    сбрасывает, а правки других групп и авторов — нет. На страницу уходит
+    два обращения к кэшу, рисуются только промахи. Посты с реплики под
+    свежей версией рисуются, но не кэшируются.
+    """
+    replica = db_router.reading_replica()
+    posts = list(posts)
+    namespaces = {
+        post.pk: [caching.post(post.pk), caching.author(post.author_id)]
+        + ([caching.group(post.group_id)] if post.group_id else [])
+        for post in posts
+    }
+    versions = caching.get_versions(
+        *{namespace for names in namespaces.values() for namespace in names}
+    )
+    keys = [
+        CARD_PREFIX + f'{post.pk}:' + '-'.join(
+            str(versions[namespace]) for namespace in namespaces[post.pk]
+        )
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string('posts/includes/post_card.html', {'post': post})
+        for key, post in zip(keys, posts)
+        if key not in cards
+    }
+    cards.update(missing)
+    stored = {
+        key: card for key, card in missing.items()
+        if not replica or not caching.is_recent(key.rsplit(':', 1)[1])
+    }
+    if stored:
+        cache.set_many(stored, settings.FRAGMENT_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import archive
+from ..models import (ArchivedComment, ArchivedPost, Comment, Counters,
+                      FeedEntry, Follow, Post)
+from ..search import get_backend
+
+User = get_user_model()
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='Reader')
+        self.author = User.objects.create_user(username='Author')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.old_post = Post.objects.create(
+            author=self.author, text='Старый пост'
+        )
+        Comment.objects.create(
+            author=self.reader, post=self.old_post, text='Старый комментарий'
+        )
+        Post.objects.filter(pk=self.old_post.pk).update(
+            created=timezone.now() - timedelta(days=400)
+        )
+        self.new_post = Post.objects.create(
+            author=self.author, text='Новый пост'
+        )
+        self.client.force_login(self.reader)
+
+    def test_old_posts_moved_to_archive(self):
+        """Старые посты с комментариями переезжают в архив"""
+        call_command('archive_posts', '--days', '365', stdout=StringIO())
+        self.assertEqual(list(Post.objects.all()), [self.new_post])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(
+            FeedEntry.objects.filter(post_id=self.old_post.pk).exists()
+        )
+        archived = ArchivedPost.objects.get(pk=self.old_post.pk)
+        self.assertEqual(archived.text, 'Старый пост')
+        self.assertEqual(archived.comments_count, 1)
+        self.assertEqual(
+            ArchivedComment.objects.get().post_id, self.old_post.pk
+        )
+        self.assertEqual(Counters.objects.get(user=self.author).posts, 2)
+        self.assertEqual(get_backend().search('старый'), [])
+
+    def test_archived_post_reachable(self):
+        """Архивный пост доступен по прежнему адресу и в профиле"""
+        url = reverse('posts:post_detail', args=(self.old_post.pk,))
+        self.client.get(url)
+        archive.archive(timezone.now() - timedelta(days=365))
+        response = self.client.get(url)
+        self.assertEqual(response.context['post'].text, 'Старый пост')
+        self.assertTrue(response.context['post'].is_archived)
+        self.assertEqual(
+            [comment.text for comment in response.context['page_obj']],
+            ['Старый комментарий']
+        )
+        self.assertNotContains(response, 'Добавить комментарий')
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,))
+        )
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Новый пост', 'Старый пост']
+        )
+
+    def test_profile_cursor_pages_span_archive(self):
+        """Курсорные страницы профиля продолжаются архивными постами"""
+        for number in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        archive.archive(timezone.now() - timedelta(days=365))
+        url = reverse('posts:profile', args=(self.author.username,))
+        first = self.client.get(url, {'cursor': ''}).context['page_obj']
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertEqual(
+            [post.text for post in second][-1], 'Старый пост'
+        )
+        self.assertFalse(second.has_next())
+
+    def test_profile_number_pages_span_archive(self):
+        """Страница по номеру собирается из живых и архивных постов"""
+        for number in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        archive.archive(timezone.now() - timedelta(days=365))
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,)),
+            {'page': 2}
+        )
+        page = response.context['page_obj']
+        self.assertEqual(
+            [post.text for post in page],
+            ['Пост 1', 'Пост 0', 'Новый пост', 'Старый пост']
+        )
+        self.assertTrue(page[-1].is_archived)
@@ -0,0 +1,60 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Counters, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='User')
+        self.author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def _counters(self, user):
+        return Counters.objects.get(user=user)
+
+    def test_posts_counter(self):
+        """Счётчик постов автора меняется при создании и удалении поста"""
+        self.assertEqual(self._counters(self.author).posts, 1)
+        self.post.delete()
+        self.assertEqual(self._counters(self.author).posts, 0)
+
+    def test_comments_counter(self):
+        """Счётчик комментариев поста меняется вместе с комментариями"""
+        comment = Comment.objects.create(
+            author=self.user, post=self.post, text='Комментарий'
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей"""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self._counters(self.author).followers, 1)
+        self.assertEqual(self._counters(self.user).following, 1)
+        Follow.objects.all().delete()
+        self.assertEqual(self._counters(self.author).followers, 0)
+        self.assertEqual(self._counters(self.user).following, 0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters пересчитывает счётчики с нуля"""
+        Follow.objects.create(user=self.user, author=self.author)
+        Comment.objects.create(
+            author=self.user, post=self.post, text='Комментарий'
+        )
+        Counters.objects.all().delete()
+        Post.objects.update(comments_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        counters = self._counters(self.author)
+        self.assertEqual((counters.posts, counters.followers), (1, 1))
+        self.assertEqual(self._counters(self.user).following, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
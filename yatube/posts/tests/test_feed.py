@@ -0,0 +1,138 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import feed
+from ..feed import get_feed
+from ..models import FeedEntry, Follow, Group, GroupSubscription, Post
+from ..templatetags.pagination import continue_cursor
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='Reader')
+        self.author = User.objects.create_user(username='Author')
+        self.old_post = Post.objects.create(
+            author=self.author,
+            text='Пост до подписки'
+        )
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(get_feed(self.reader)), [self.old_post])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(get_feed(self.reader).first(), post)
+
+    def test_unfollow_trims_feed(self):
+        """После отписки посты автора удаляются из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(get_feed(self.reader).count(), 0)
+
+    @override_settings(FEED_BACKFILL_SIZE=2)
+    def test_rebuild_matches_backfill(self):
+        """Пересборка лент даёт те же записи, что и подписка"""
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        Follow.objects.create(user=self.reader, author=self.author)
+        entries = set(FeedEntry.objects.values_list('user', 'post', 'created'))
+        self.assertEqual(len(entries), 2)
+        feed.rebuild()
+        self.assertEqual(
+            set(FeedEntry.objects.values_list('user', 'post', 'created')),
+            entries
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_read_on_request(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(list(get_feed(self.reader)), [post, self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_below_limit_backfilled(self):
+        """Посты автора, переставшего быть популярным, остаются в лентах"""
+        stranger = User.objects.create_user(username='Stranger')
+        Follow.objects.create(user=stranger, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(list(get_feed(self.reader)), [post, self.old_post])
+        Follow.objects.filter(user=stranger).delete()
+        self.assertEqual(list(get_feed(self.reader)), [post, self.old_post])
+
+    def test_group_subscription_merged(self):
+        """Посты групп из подписок сливаются с лентой без повторов"""
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        stranger = User.objects.create_user(username='Stranger')
+        Follow.objects.create(user=self.reader, author=self.author)
+        GroupSubscription.objects.create(user=self.reader, group=group)
+        in_group = Post.objects.create(
+            author=stranger, group=group, text='Пост в группе'
+        )
+        both = Post.objects.create(
+            author=self.author, group=group, text='Пост автора в группе'
+        )
+        Post.objects.create(author=stranger, text='Пост вне подписок')
+        posts = get_feed(self.reader)
+        self.assertEqual(list(posts), [both, in_group, self.old_post])
+        self.assertEqual(posts.count(), 3)
+        self.assertEqual(list(posts[1:3]), [in_group, self.old_post])
+
+    def test_follow_page_is_exact(self):
+        """Страница ленты из нескольких источников — обычная страница"""
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        GroupSubscription.objects.create(user=self.reader, group=group)
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(12):
+            Post.objects.create(
+                author=self.author, group=group if number % 2 else None,
+                text=f'Пост {number}'
+            )
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:follow_index') + '?page=2')
+        page = response.context['page_obj']
+        self.assertEqual(page.paginator.count, 13)
+        self.assertEqual(
+            [post.text for post in page],
+            ['Пост 1', 'Пост 0', 'Пост до подписки']
+        )
+
+    @override_settings(FEED_MAX_PAGES=1)
+    def test_follow_page_depth_capped(self):
+        """Дальние страницы ленты по номеру недоступны, дальше — курсор"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(reverse('posts:follow_index') + '?page=2')
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 1)
+        self.assertEqual(page.paginator.count, 10)
+        cursor = continue_cursor(page)
+        self.assertContains(response, f'?cursor={cursor}')
+        response = client.get(
+            reverse('posts:follow_index'), {'cursor': cursor}
+        )
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Пост 1', 'Пост 0', 'Пост до подписки']
+        )
@@ -0,0 +1,64 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Counters, FeedEntry, Follow, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDataTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, prefix, seed=7):
+        call_command(
+            'generate_data', users=30, groups=3, posts=200, comments=300,
+            follows=5, image_ratio=0.5, image_pool=2, seed=seed,
+            batch_size=50, prefix=prefix, stdout=io.StringIO()
+        )
+
+    def test_volumes(self):
+        """Команда создаёт заданное число записей и пересчитывает счётчики"""
+        self.generate('a')
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertFalse(
+            Post.objects.exclude(image='').filter(image_variants='').exists()
+        )
+        self.assertEqual(
+            sum(Counters.objects.values_list('posts', flat=True)), 200
+        )
+        self.assertEqual(
+            sum(Counters.objects.values_list('followers', flat=True)),
+            Follow.objects.count()
+        )
+        self.assertTrue(FeedEntry.objects.exists())
+
+    def test_deterministic(self):
+        """Одинаковый seed даёт одинаковые тексты и граф подписок"""
+        self.generate('a')
+        self.generate('b')
+
+        def snapshot(prefix):
+            texts = sorted(Post.objects.filter(
+                author__username__startswith=prefix
+            ).values_list('text', flat=True))
+            follows = sorted(
+                (user[len(prefix):], author[len(prefix):])
+                for user, author in Follow.objects.filter(
+                    user__username__startswith=prefix
+                ).values_list('user__username', 'author__username')
+            )
+            return texts, follows
+
+        self.assertEqual(snapshot('a'), snapshot('b'))
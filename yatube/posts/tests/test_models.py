@@ -1,7 +1,10 @@
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -33,3 +36,48 @@ class PostModelTest(TestCase):
         for obj_model, str_model in data.items():
             with self.subTest(model=obj_model):
                 self.assertEqual(str(obj_model), str_model)
+
+
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slag',
+            description='Тестовое описание',
+        )
+
+    def _query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN SQLite')
+    def test_listing_queries_use_indexes(self):
+        """Запросы лент постов используют составные индексы"""
+        querysets = {
+            'post_created_idx': Post.objects.all(),
+            'post_author_created_idx': self.user.posts.all(),
+            'post_group_created_idx': self.group.groups.all(),
+            'comment_post_created_idx': Comment.objects.filter(post_id=1),
+        }
+        for index, queryset in querysets.items():
+            with self.subTest(index=index):
+                plan = self._query_plan(queryset)
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка и подписка на себя запрещены в базе"""
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        for follower, following in ((self.user, author), (author, author)):
+            with self.subTest(user=follower, author=following):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(
+                            user=follower, author=following
+                        )
@@ -0,0 +1,176 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import archive, notifications
+from ..models import Comment, Counters, Follow, Notification, Post
+
+User = get_user_model()
+
+
+class NotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.other = User.objects.create_user(username='Other')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def deliver(self, *actors, kind=Notification.COMMENT):
+        post_id = self.post.pk if kind == Notification.COMMENT else None
+        return notifications.deliver(
+            (self.author.pk, kind, post_id, actor.pk) for actor in actors
+        )
+
+    def unread(self):
+        return Counters.objects.get(user=self.author).notifications
+
+    def test_deliver_collapses_events(self):
+        """Повторные события схлопываются в одно непрочитанное уведомление"""
+        self.deliver(self.reader, self.other, self.reader)
+        self.deliver(self.other, kind=Notification.FOLLOW)
+        self.deliver(self.other)
+        comment = Notification.objects.get(kind=Notification.COMMENT)
+        self.assertEqual(comment.count, 4)
+        self.assertEqual(comment.actor, self.other)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(self.unread(), 2)
+
+    def test_deliver_large_batch(self):
+        """Большая пачка на разные посты доставляется целиком"""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(1500)
+        )
+        events = [
+            (self.author.pk, Notification.COMMENT, post_id, self.reader.pk)
+            for post_id in Post.objects.exclude(pk=self.post.pk).values_list(
+                'pk', flat=True
+            )
+        ]
+        self.assertEqual(notifications.deliver(events), 1500)
+        self.assertEqual(notifications.deliver(events), 1500)
+        self.assertEqual(
+            Notification.objects.filter(count=2).count(), 1500
+        )
+        self.assertEqual(self.unread(), 1500)
+
+    def test_deliver_skips_deleted_rows(self):
+        """События об удалённых постах и авторах не срывают пачку"""
+        gone = User.objects.create_user(username='Gone')
+        gone_pk = gone.pk
+        gone.delete()
+        deleted = Post.objects.create(author=self.author, text='Удалённый')
+        deleted_pk = deleted.pk
+        deleted.delete()
+        delivered = notifications.deliver(
+            (self.author.pk, Notification.COMMENT, post_id, actor_id)
+            for post_id, actor_id in (
+                (self.post.pk, gone_pk),
+                (deleted_pk, self.reader.pk),
+                (self.post.pk, self.other.pk),
+            )
+        )
+        self.assertEqual(delivered, 1)
+        notification = Notification.objects.get()
+        self.assertEqual(
+            (notification.post, notification.actor, notification.count),
+            (self.post, self.other, 1)
+        )
+        self.assertEqual(self.unread(), 1)
+
+    def test_one_unread_per_key(self):
+        """Второе непрочитанное уведомление с тем же ключом не создаётся"""
+        self.deliver(self.reader)
+        self.deliver(self.reader, kind=Notification.FOLLOW)
+        for post in (self.post, None):
+            kind = Notification.COMMENT if post else Notification.FOLLOW
+            with self.subTest(kind=kind):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Notification.objects.create(
+                            user=self.author, kind=kind, post=post,
+                            actor=self.other
+                        )
+
+    def test_deleted_notifications_leave_counter(self):
+        """Удалённые непрочитанные уведомления вычитаются из счётчика"""
+        other_post = Post.objects.create(author=self.author, text='Другой')
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        self.deliver(self.reader)
+        self.deliver(self.other, kind=Notification.FOLLOW)
+        notifications.deliver([
+            (self.author.pk, Notification.COMMENT, post.pk, self.reader.pk)
+            for post in (other_post, old_post)
+        ])
+        self.assertEqual(self.unread(), 4)
+        other_post.delete()
+        self.assertEqual(self.unread(), 3)
+        Post.objects.filter(pk=old_post.pk).update(
+            created=timezone.now() - timedelta(days=400)
+        )
+        archive.archive(timezone.now() - timedelta(days=365))
+        self.assertEqual(self.unread(), 2)
+        self.other.delete()
+        self.assertEqual(self.unread(), 1)
+        self.assertEqual(Notification.objects.filter(unread=True).count(), 1)
+
+    def test_inbox_marks_read(self):
+        """Шапка показывает счётчик, страница уведомлений обнуляет его"""
+        self.deliver(self.reader, self.other, self.reader)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'bg-danger">1</span>')
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertContains(response, '3 новых комментария')
+        self.assertEqual(self.unread(), 0)
+        self.assertFalse(Notification.objects.filter(unread=True).exists())
+        self.deliver(self.reader)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(self.unread(), 1)
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class NotificationSignalTests(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def test_comment_notifies_author(self):
+        """Комментарий уведомляет автора поста, свой комментарий — нет"""
+        client = Client()
+        client.force_login(self.reader)
+        client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'}
+        )
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ'
+        )
+        notification = Notification.objects.get()
+        self.assertEqual(
+            (notification.user, notification.actor, notification.post),
+            (self.author, self.reader, self.post)
+        )
+
+    @override_settings(
+        NOTIFICATIONS_ASYNC=True, NOTIFICATION_FLUSH_SECONDS=60
+    )
+    def test_follow_delivered_in_batch(self):
+        """Подписка копится в буфере и доставляется пачкой"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(notifications.flush(), 1)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.kind, Notification.FOLLOW)
+        self.assertEqual(
+            Counters.objects.get(user=self.author).notifications, 1
+        )
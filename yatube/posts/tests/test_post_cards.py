@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from .. import caching
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='Author', first_name='Лев', last_name='Толстой'
+        )
+        self.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Первый пост'
+        )
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.template = Template(
+            '{% load post_cards %}{% post_cards posts as cards %}'
+            '{% for card in cards %}{{ card }}<hr>{% endfor %}'
+        )
+
+    def render(self):
+        posts = Post.objects.select_related('author', 'group')
+        return self.template.render(Context({'posts': posts}))
+
+    def test_cards_cached(self):
+        """Повторная отрисовка берёт карточки из кэша"""
+        first = self.render()
+        self.assertIn('Первый пост', first)
+        self.assertIn('Лев Толстой', first)
+        self.assertEqual(first.count('<hr>'), 2)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        self.assertEqual(self.render(), first)
+
+    def test_cards_invalidated(self):
+        """Правка поста, группы или автора сбрасывает карточки"""
+        self.render()
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertIn('Исправленный пост', self.render())
+        self.group.title = 'Новая классика'
+        self.group.save()
+        self.assertIn('Новая классика', self.render())
+        self.author.first_name = 'Алексей'
+        self.author.save()
+        self.assertIn('Алексей Толстой', self.render())
+
+    def test_cards_kept_on_other_changes(self):
+        """Правка чужой группы или чужого автора карточки не сбрасывает"""
+        first = self.render()
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        other = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+        other.title = 'Другая группа'
+        other.save()
+        stranger = User.objects.create_user(username='Stranger')
+        stranger.first_name = 'Иван'
+        stranger.save()
+        self.assertEqual(self.render(), first)
+
+
+class CacheVersionCommitTests(TransactionTestCase):
+    def test_version_changed_again_after_commit(self):
+        """Фрагмент, сохранённый до фиксации правки, не читается после неё"""
+        cache.clear()
+        author = User.objects.create_user(username='Author')
+        post = Post.objects.create(author=author, text='Пост')
+        with transaction.atomic():
+            post.text = 'Исправленный пост'
+            post.save()
+            during = caching.get_version(caching.post(post.pk))
+        self.assertNotEqual(caching.get_version(caching.post(post.pk)), during)
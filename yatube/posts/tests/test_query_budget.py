@@ -0,0 +1,162 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import notifications, urls
+from ..models import (Comment, Follow, Group, GroupSubscription,
+                      Notification, Post)
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+# Допустимое количество запросов на страницу авторизованного пользователя,
+# включая чтение сессии и пользователя, а для изменяющих данные страниц
+# ещё и точки сохранения транзакций. Профиль дополнительно считает
+# архивные посты автора, профиль и лента читают рекомендации подписок,
+# страница группы проверяет подписку на неё, уведомления отмечаются
+# прочитанными. Лента читает по запросу на вид источника: материализованную
+# ленту, популярных авторов и группы из подписок. Отписка проверяет, не
+# опустился ли автор до порога рассылки
+QUERY_BUDGETS = {
+    'index': 4,
+    'trending': 4,
+    'group_list': 6,
+    'profile': 7,
+    'post_detail': 5,
+    'post_edit': 4,
+    'post_create': 3,
+    'add_comment': 3,
+    'follow_index': 8,
+    'search': 5,
+    'profile_follow': 7,
+    'profile_unfollow': 13,
+    'group_subscribe': 7,
+    'group_unsubscribe': 4,
+    'notifications': 5,
+}
+
+# Страницы, которые отвечают перенаправлением
+REDIRECTS = {
+    'add_comment', 'profile_follow', 'profile_unfollow', 'group_subscribe',
+    'group_unsubscribe',
+}
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(12):
+            author = User.objects.create_user(
+                username=f'Author{number}', first_name=f'Имя{number}'
+            )
+            Follow.objects.create(user=cls.user, author=author)
+            post = Post.objects.create(
+                author=author, text=f'Пост {number}', group=cls.group
+            )
+            Comment.objects.create(
+                author=author, post=post, text=f'Комментарий {number}'
+            )
+        GroupSubscription.objects.create(user=cls.user, group=cls.group)
+        cls.post = Post.objects.create(author=cls.user, text='Свой пост')
+        for number in range(12):
+            Comment.objects.create(
+                author=User.objects.get(username=f'Author{number}'),
+                post=cls.post,
+                text=f'Комментарий {number}'
+            )
+        # Уведомления доставляются после фиксации транзакции, в TestCase
+        # её нет, поэтому доставка вызывается напрямую
+        notifications.deliver(
+            (cls.user.pk, Notification.COMMENT, cls.post.pk, author.pk)
+            for author in User.objects.exclude(pk=cls.user.pk)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def _url(self, name):
+        kwargs = {
+            'group_list': {'slug': self.group.slug},
+            'profile': {'username': 'Author0'},
+            'post_detail': {'post_id': self.post.pk},
+            'post_edit': {'post_id': self.post.pk},
+            'add_comment': {'post_id': self.post.pk},
+            'profile_follow': {'username': 'Author0'},
+            'profile_unfollow': {'username': 'Author1'},
+            'group_subscribe': {'slug': self.group.slug},
+            'group_unsubscribe': {'slug': self.group.slug},
+        }
+        return reverse(f'posts:{name}', kwargs=kwargs.get(name))
+
+    def test_every_view_has_budget(self):
+        """Для каждой страницы posts.urls задан бюджет запросов"""
+        for pattern in urls.urlpatterns:
+            with self.subTest(name=pattern.name):
+                self.assertIn(pattern.name, QUERY_BUDGETS)
+
+    def _measure(self, name, budget):
+        """Запросы страницы на чистом кэше, изменения данных откатываются."""
+        cache.clear()
+        with transaction.atomic():
+            executed = self.assertQueryBudget(
+                self.client, self._url(name), budget,
+                HTTPStatus.FOUND if name in REDIRECTS else HTTPStatus.OK
+            )
+            transaction.set_rollback(True)
+        return executed
+
+    def _grow(self):
+        """Больше постов, комментариев и уведомлений на каждой странице."""
+        for author in User.objects.filter(username__startswith='Author'):
+            for number in range(2):
+                Post.objects.create(
+                    author=author, text=f'Ещё пост {number}', group=self.group
+                )
+                Comment.objects.create(
+                    author=author, post=self.post, text=f'Ещё {number}'
+                )
+                own = Post.objects.create(
+                    author=self.user, text=f'Свой {number}'
+                )
+                notifications.deliver([
+                    (self.user.pk, Notification.COMMENT, own.pk, author.pk)
+                ])
+
+    def test_views_fit_query_budget(self):
+        """Количество запросов не зависит от числа постов на странице"""
+        small = {
+            name: self._measure(name, budget)
+            for name, budget in QUERY_BUDGETS.items()
+        }
+        self._grow()
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                self.assertEqual(self._measure(name, budget), small[name])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_follow_index_independent_of_subscriptions(self):
+        """Запросы ленты не зависят от числа подписок"""
+        # Все авторы читаются при запросе: на источник больше, чем в бюджете
+        budget = QUERY_BUDGETS['follow_index'] + 1
+        before = self._measure('follow_index', budget)
+        author = User.objects.get(username='Author0')
+        for number in range(3):
+            group = Group.objects.create(
+                title=f'Группа {number}', slug=f'group-{number}',
+                description='Описание'
+            )
+            GroupSubscription.objects.create(user=self.user, group=group)
+            Post.objects.create(author=author, text='Пост', group=group)
+        self.assertEqual(self._measure('follow_index', budget), before)
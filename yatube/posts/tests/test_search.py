@@ -0,0 +1,121 @@
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from ..search import search_page
+from ..utils import encode_token
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Индекс на SQLite FTS5')
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        self.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание'
+        )
+        self.post = Post.objects.create(
+            author=self.author, text='Все счастливые семьи похожи'
+        )
+        self.other = Post.objects.create(
+            author=self.author, text='Пост про погоду', group=self.group
+        )
+
+    def _found(self, query):
+        return list(search_page(query))
+
+    def test_search_post_text_and_prefix(self):
+        """Пост находится по словам и началу слова из текста"""
+        self.assertEqual(self._found('счастливые семьи'), [self.post])
+        self.assertEqual(self._found('счастлив'), [self.post])
+        self.assertEqual(self._found('несуществующее'), [])
+
+    def test_search_comments_group_and_author(self):
+        """Индекс покрывает комментарии, группу и имя автора"""
+        Comment.objects.create(
+            author=self.author, post=self.post, text='Отличный роман'
+        )
+        self.assertEqual(self._found('роман'), [self.post])
+        self.assertEqual(self._found('классика'), [self.other])
+        self.assertEqual(len(self._found('толстой')), 2)
+
+    def test_comment_indexed_as_own_row(self):
+        """Новый комментарий не пересобирает документ поста"""
+        with patch('posts.search.SQLiteFTSBackend.index_posts') as index:
+            comment = Comment.objects.create(
+                author=self.author, post=self.post, text='Отличный роман'
+            )
+        index.assert_not_called()
+        self.assertEqual(self._found('семьи роман'), [self.post])
+        self.assertEqual(self._found('погоду роман'), [])
+        comment.delete()
+        self.assertEqual(self._found('роман'), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при правке и удалении поста"""
+        self.post.text = 'Несчастливая семья'
+        self.post.save()
+        self.assertEqual(self._found('похожи'), [])
+        Comment.objects.create(
+            author=self.author, post=self.post, text='Отличный роман'
+        )
+        self.post.delete()
+        self.assertEqual(self._found('семья'), [])
+        self.assertEqual(self._found('роман'), [])
+
+    def test_author_reindexed_on_name_change(self):
+        """Посты переиндексируются при смене имени, но не пароля"""
+        self.author.set_password('new-password')
+        with patch('posts.search.SQLiteFTSBackend.index_posts') as index:
+            self.author.save()
+        index.assert_not_called()
+        self.author.last_name = 'Достоевский'
+        self.author.save()
+        self.assertEqual(len(self._found('достоевский')), 2)
+        self.assertEqual(self._found('толстой'), [])
+
+    def test_ranking_and_keyset_pages(self):
+        """Совпадение в тексте важнее, страницы листаются курсором"""
+        Comment.objects.create(
+            author=self.author, post=self.other, text='погода погода'
+        )
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'семьи {number}')
+            for number in range(12)
+        )
+        self.assertEqual(self._found('погода')[0], self.other)
+        call_command('rebuild_search_index', stdout=StringIO())
+        first = search_page('семьи')
+        second = search_page('семьи', first.next_cursor)
+        found = list(first) + list(second)
+        self.assertEqual(len(found), 13)
+        self.assertEqual(len(set(found)), 13)
+        back = search_page('семьи', second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты"""
+        response = Client().get(reverse('posts:search'), {'q': 'семьи'})
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, self.other.text)
+
+    def test_bad_cursor_opens_first_page(self):
+        """Курсор с чужими типами открывает первую страницу"""
+        token = encode_token(['1', 'y', 'n'])
+        self.assertEqual(
+            list(search_page('семьи', token)), list(search_page('семьи'))
+        )
+        response = Client().get(
+            reverse('posts:search'), {'q': 'семьи', 'cursor': token}
+        )
+        self.assertContains(response, self.post.text)
@@ -0,0 +1,135 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .. import caching, services
+from ..models import (Comment, Counters, FeedEntry, Follow, Group,
+                      Notification, Post)
+from ..search import get_backend
+
+User = get_user_model()
+
+
+class BulkServicesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_create_posts(self):
+        """Пакет постов сохраняется вместе со счётчиками, лентой и поиском"""
+        items = [
+            {'author': 'Author', 'text': f'Пост номер {number}',
+             'group': self.group.pk}
+            for number in range(services.CHUNK_SIZE + 3)
+        ]
+        with self.assertNumQueries(25):
+            posts, errors = services.create_posts(items)
+        self.assertEqual(errors, {})
+        self.assertEqual(
+            [post.pk for post in posts],
+            list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        )
+        self.assertEqual(
+            Counters.objects.get(user=self.author).posts, len(items)
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), len(items)
+        )
+        self.assertEqual(
+            len(get_backend().search('номер', limit=len(items) + 1)),
+            len(items)
+        )
+
+    def test_invalid_posts_not_saved(self):
+        """Если одна запись с ошибкой, не сохраняется ни одна"""
+        posts, errors = services.create_posts([
+            {'author': 'Author', 'text': 'Хороший пост'},
+            {'author': 'Author', 'text': ''},
+            {'author': 'Nobody', 'text': 'Пост', 'group': 999},
+        ])
+        self.assertEqual(posts, [])
+        self.assertEqual(set(errors), {1, 2})
+        self.assertIn('text', errors[1])
+        self.assertIn('group', errors[2])
+        self.assertIn('__all__', errors[2])
+        self.assertFalse(Post.objects.exists())
+
+    def test_create_comments(self):
+        """Пакет комментариев обновляет счётчики постов"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comments, errors = services.create_comments([
+            {'author': 'Reader', 'post': post.pk, 'text': 'Первый'},
+            {'author': 'Author', 'post': post.pk, 'text': 'Второй'},
+        ])
+        self.assertEqual(errors, {})
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            list(Comment.objects.order_by('pk').values_list('pk', flat=True))
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        _, errors = services.create_comments([
+            {'author': 'Reader', 'post': post.pk + 1, 'text': 'Текст'},
+        ])
+        self.assertIn('__all__', errors[0])
+
+    def test_create_follows(self):
+        """Пакет подписок пропускает повторы и заполняет ленты"""
+        writer = User.objects.create_user(username='Writer')
+        Post.objects.create(author=writer, text='Пост')
+        follows, errors = services.create_follows([
+            {'user': 'Reader', 'author': 'Writer'},
+            {'user': 'Reader', 'author': 'Writer'},
+            {'user': 'Reader', 'author': 'Author'},
+            {'user': 'Author', 'author': 'Writer'},
+        ])
+        self.assertEqual(errors, {})
+        self.assertEqual(len(follows), 2)
+        self.assertEqual(Counters.objects.get(user=writer).followers, 2)
+        self.assertEqual(Counters.objects.get(user=self.reader).following, 2)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.author).count(), 1
+        )
+        _, errors = services.create_follows([
+            {'user': 'Reader', 'author': 'Reader'},
+        ])
+        self.assertIn('__all__', errors[0])
+
+
+@override_settings(NOTIFICATIONS_ASYNC=False)
+class BulkServicesCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+
+    def test_cache_touched_after_commit(self):
+        """Версии кэша сбрасываются после фиксации всей пачки"""
+        version = caching.get_version(caching.INDEX)
+        posts, errors = services.create_posts(
+            [{'author': 'Author', 'text': 'Пост'}]
+        )
+        self.assertEqual(errors, {})
+        self.assertNotEqual(caching.get_version(caching.INDEX), version)
+
+    def test_bulk_comments_and_follows_notify(self):
+        """Пачки комментариев и подписок уведомляют, как и одиночные"""
+        User.objects.create_user(username='Reader')
+        post = Post.objects.create(author=self.author, text='Пост')
+        services.create_comments([
+            {'author': 'Reader', 'post': post.pk, 'text': 'Первый'},
+            {'author': 'Reader', 'post': post.pk, 'text': 'Второй'},
+            {'author': 'Author', 'post': post.pk, 'text': 'Свой'},
+        ])
+        services.create_follows([{'user': 'Reader', 'author': 'Author'}])
+        self.assertEqual(
+            sorted(Notification.objects.filter(
+                user=self.author
+            ).values_list('kind', 'count')),
+            [(Notification.COMMENT, 2), (Notification.FOLLOW, 1)]
+        )
+        self.assertEqual(
+            Counters.objects.get(user=self.author).notifications, 2
+        )
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import suggestions
+from ..models import Follow, FollowSuggestion, Group, Post
+
+User = get_user_model()
+
+
+class SuggestionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='Reader')
+        self.friend = User.objects.create_user(username='Friend')
+        self.popular = User.objects.create_user(username='Popular')
+        self.neighbour = User.objects.create_user(username='Neighbour')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=self.reader, author=self.friend)
+        Follow.objects.create(user=self.friend, author=self.popular)
+        Follow.objects.create(user=self.friend, author=self.reader)
+        Post.objects.create(author=self.reader, group=group, text='Мой')
+        Post.objects.create(author=self.neighbour, group=group, text='Сосед')
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_csr(self):
+        """Строки матрицы содержат соседей вершины"""
+        matrix = suggestions.CSR([2, 0, 2], [1, 2, 0], 3)
+        self.assertEqual(list(matrix[0]), [2])
+        self.assertEqual(list(matrix[1]), [])
+        self.assertEqual(sorted(matrix[2]), [0, 1])
+
+    def test_compute_ranks_candidates(self):
+        """Подписки подписок весят больше общих групп, свои не предлагаются"""
+        out = StringIO()
+        call_command('compute_suggestions', '--batch-size', '1', stdout=out)
+        self.assertIn('Рекомендаций:', out.getvalue())
+        rows = list(
+            FollowSuggestion.objects.filter(user=self.reader)
+            .values_list('author__username', 'mutual', 'groups')
+        )
+        self.assertEqual(rows, [('Popular', 1, 0), ('Neighbour', 0, 1)])
+
+    def test_pages_show_suggestions(self):
+        """Профиль и лента выводят рекомендации, подписка их убирает"""
+        suggestions.compute()
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', args=[self.friend.username]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    [item.author for item in response.context['suggestions']],
+                    [self.popular, self.neighbour]
+                )
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.popular.username])
+        )
+        self.assertFalse(
+            FollowSuggestion.objects.filter(
+                user=self.reader, author=self.popular
+            ).exists()
+        )
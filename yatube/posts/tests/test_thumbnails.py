@@ -0,0 +1,87 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+def make_image(name='picture.png', size=(300, 200), color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='User')
+        self.post = Post.objects.create(
+            author=self.user, text='Пост с картинкой', image=make_image()
+        )
+
+    def test_generate_card_variant(self):
+        """Превью карточки нарезается под размер 960x339"""
+        variants = thumbnails.generate_variants(self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.variants, variants)
+        with self.post.image.storage.open(variants['card']) as card:
+            self.assertEqual(Image.open(card).size, thumbnails.CARD_SIZE)
+
+    @override_settings(POST_IMAGE_WIDTHS=(100, 200, 1000))
+    def test_generate_responsive_variants(self):
+        """Нарезаются ширины не больше оригинала во всех доступных форматах"""
+        variants = thumbnails.generate_variants(self.post.pk)
+        for label, *_ in thumbnails.available_formats():
+            with self.subTest(format=label):
+                self.assertEqual(sorted(variants[label]), ['100', '200'])
+        self.post.refresh_from_db()
+        if 'webp' in variants:
+            sources = dict(self.post.image_sources)
+            self.assertIn(' 200w', sources['image/webp'])
+
+    def test_placeholder_while_pending(self):
+        """Пока превью не готово, на странице выводится заглушка"""
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'img/placeholder.svg')
+        thumbnails.generate_variants(self.post.pk)
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, 'img/placeholder.svg')
+        self.assertContains(response, thumbnails.VARIANTS_DIR)
+        self.assertContains(response, 'sizes="(max-width: 992px)')
+
+    def test_variants_of_same_named_images_kept_apart(self):
+        """Превью одноимённых картинок разных форматов не смешиваются"""
+        png = Post.objects.create(
+            author=self.user, text='Красная', image=make_image('same.png')
+        )
+        jpg = Post.objects.create(
+            author=self.user, text='Синяя',
+            image=make_image('same.jpg', color=(30, 30, 200))
+        )
+        cards = [
+            thumbnails.generate_variants(post.pk)['card']
+            for post in (png, jpg)
+        ]
+        self.assertNotEqual(cards[0], cards[1])
+        with png.image.storage.open(cards[0]) as card:
+            red, _, blue = Image.open(card).convert('RGB').getpixel((0, 0))
+        self.assertGreater(red, blue)
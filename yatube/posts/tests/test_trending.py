@@ -0,0 +1,65 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Follow, Post, TrendingScore
+
+User = get_user_model()
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='Reader')
+        self.author = User.objects.create_user(username='Author')
+        self.quiet = Post.objects.create(author=self.reader, text='Тихий')
+        self.discussed = Post.objects.create(
+            author=self.author, text='Обсуждаемый'
+        )
+        for number in range(3):
+            Comment.objects.create(
+                author=self.reader, post=self.discussed, text=f'{number}'
+            )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.old = Post.objects.create(author=self.author, text='Старый')
+        Post.objects.filter(pk=self.old.pk).update(
+            created=timezone.now() - timedelta(days=30)
+        )
+
+    def test_scores(self):
+        """Оценка растёт с комментариями и подписками и падает с возрастом"""
+        now = timezone.now()
+        created = [now, now, now - timedelta(hours=10)]
+        fresh, discussed, aged = trending.scores(
+            created, [0, 3, 3], [0, 1, 1], now
+        )
+        self.assertGreater(discussed, fresh)
+        self.assertGreater(discussed, aged)
+        self.assertAlmostEqual(fresh, 1 / 2 ** 1.5)
+
+    def test_compute_ranks_window(self):
+        """Рейтинг строится по окну кандидатов пачками"""
+        TrendingScore.objects.create(post=self.old, score=100)
+        out = StringIO()
+        call_command('compute_trending', '--batch-size', '1', stdout=out)
+        self.assertIn('Оценено постов: 2', out.getvalue())
+        self.assertEqual(
+            list(TrendingScore.objects.values_list('post', flat=True)),
+            [self.discussed.pk, self.quiet.pk]
+        )
+
+    def test_trending_page(self):
+        """Страница популярного выводит посты в порядке рейтинга"""
+        trending.compute()
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            list(response.context['page_obj']), [self.discussed, self.quiet]
+        )
+        self.assertContains(response, 'Обсуждаемый')
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+from ..utils import (CachedCount, CursorPage, WindowedPaginator,
+                     decode_cursor, encode_cursor, get_cursor_page)
+
+NUMBER_OF_POSTS_DISPLAYED = settings.NUMBER_OF_POSTS_DISPLAYED
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='User')
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {number}')
+            for number in range(NUMBER_OF_POSTS_DISPLAYED + 5)
+        )
+        self.posts = list(Post.objects.order_by('-created', '-pk'))
+
+    def test_cursor_round_trip(self):
+        """Токен курсора кодируется и разбирается без потерь"""
+        post = self.posts[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(post, 'n')),
+            (post.created, post.pk, 'n')
+        )
+        self.assertIsNone(decode_cursor('испорченный'))
+
+    def test_pages_forward_and_back(self):
+        """Переход на следующую и обратно на предыдущую страницу"""
+        first = get_cursor_page(Post.objects.all(), None)
+        self.assertEqual(
+            list(first), self.posts[:NUMBER_OF_POSTS_DISPLAYED]
+        )
+        self.assertFalse(first.has_previous())
+        second = get_cursor_page(Post.objects.all(), first.next_cursor)
+        self.assertEqual(
+            list(second), self.posts[NUMBER_OF_POSTS_DISPLAYED:]
+        )
+        self.assertFalse(second.has_next())
+        back = get_cursor_page(Post.objects.all(), second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_pages_stable_under_inserts(self):
+        """Новые посты не сдвигают следующую страницу"""
+        first = get_cursor_page(Post.objects.all(), None)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        second = get_cursor_page(Post.objects.all(), first.next_cursor)
+        self.assertEqual(
+            list(second), self.posts[NUMBER_OF_POSTS_DISPLAYED:]
+        )
+
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_index_uses_cursor_page(self):
+        """При включённой настройке главная отдаёт курсорную страницу"""
+        response = Client().get(reverse('posts:index'))
+        self.assertIsInstance(response.context['page_obj'], CursorPage)
+        self.assertContains(response, '?cursor=')
+
+
+class WindowedPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='User')
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {number}')
+            for number in range(25)
+        )
+        self.posts = Post.objects.all()
+
+    def test_elided_page_range(self):
+        """Ссылки выводятся только вокруг текущей страницы и по краям"""
+        paginator = WindowedPaginator(range(1000), 10)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(50)),
+            [1, 2, '…', 47, 48, 49, 50, 51, 52, 53, '…', 99, 100]
+        )
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, 4, '…', 99, 100]
+        )
+        self.assertEqual(
+            list(WindowedPaginator(range(50), 10).get_elided_page_range(3)),
+            [1, 2, 3, 4, 5]
+        )
+
+    def test_cached_count(self):
+        """Количество берётся из кэша и приблизительно после изменений"""
+        with self.assertNumQueries(1):
+            self.assertEqual(CachedCount(self.posts, 'test', 'v1').get(), 25)
+        with self.assertNumQueries(0):
+            count = CachedCount(self.posts, 'test', 'v1')
+            self.assertEqual(count.get(), 25)
+            self.assertTrue(count.exact)
+            count = CachedCount(self.posts, 'test', 'v2')
+            self.assertEqual(count.get(), 25)
+            self.assertFalse(count.exact)
+
+    def test_stale_count_refreshed_for_far_page(self):
+        """Устаревшее количество не обрезает страницы и уточняется"""
+        CachedCount(self.posts, 'test', 'v1').refresh()
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Новый пост {number}')
+            for number in range(10)
+        )
+        paginator = WindowedPaginator(
+            self.posts, 10, CachedCount(self.posts, 'test', 'v2')
+        )
+        self.assertEqual(len(paginator.get_page(3)), 10)
+        page = paginator.get_page(4)
+        self.assertEqual(page.number, 4)
+        self.assertEqual(paginator.count, 35)
+
+    def test_index_skips_count_query(self):
+        """Повторный запрос главной не считает посты заново"""
+        self.client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 25)
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries)
+        )
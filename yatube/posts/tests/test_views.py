@@ -178,20 +178,31 @@ class PostURLTests(TestCase):
                 )
 
     def test_cash_index(self):
-        """Тестирование работы кэша главной страницы"""
+        """Список постов главной берётся из кэша до изменения данных"""
         response = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=Post.objects.first().pk).update(
+            text='Изменено в обход модели'
+        )
+        response_cash = self.authorized_client.get(reverse('posts:index'))
         Post.objects.create(
             author=self.user,
-            text=uuid.uuid4(),
+            text='Новый пост сбрасывает кэш',
             group=PostURLTests.group
         )
-        response_cash = self.authorized_client.get(reverse('posts:index'))
-        cache.clear()
         response_without_cash = self.authorized_client.get(
             reverse('posts:index')
         )
         self.assertEqual(response.content, response_cash.content)
-        self.assertNotEqual(response.content, response_without_cash.content)
+        self.assertNotContains(response_cash, 'Изменено в обход модели')
+        self.assertContains(
+            response_without_cash, 'Новый пост сбрасывает кэш'
+        )
+
+    def test_cash_keeps_user_chrome_fresh(self):
+        """Шапка страницы не берётся из кэша другого пользователя"""
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, f'Пользователь: {self.user}')
 
 
 class FollowTests(TestCase):
@@ -0,0 +1,21 @@
+from http import HTTPStatus
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка количества SQL-запросов, которые делает страница."""
+
+    def assertQueryBudget(self, client, url, budget, status=HTTPStatus.OK):
+        """Проверяет код ответа и бюджет, возвращает число запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, status, url)
+        executed = len(queries)
+        if executed > budget:
+            self.fail(
+                f'{url} выполняет {executed} запросов при бюджете {budget}:\n'
+                + '\n'.join(query['sql'] for query in queries)
+            )
+        return executed
@@ -0,0 +1,155 @@
+"""Фоновая нарезка превью для картинок постов.
+
+Превью готовятся в пуле потоков после сохранения поста, пути к ним
+записываются в Post.image_variants. Кроме JPEG-превью карточки
+нарезается набор ширин в WebP и, если Pillow умеет, в AVIF для srcset.
+Пока превью не готово, шаблоны показывают заглушку и не открывают
+оригинал внутри запроса.
+"""
+import io
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from core import metrics
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from . import caching
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+CARD = 'card'
+CARD_SIZE = (960, 339)
+VARIANTS_DIR = 'posts/variants/'
+
+# Форматы для srcset в порядке предпочтения браузером:
+# метка, формат Pillow, расширение, параметры сохранения
+RESPONSIVE_FORMATS = (
+    ('avif', 'AVIF', 'avif', {'quality': 60}),
+    ('webp', 'WEBP', 'webp', {'quality': 80}),
+)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def variant_name(image_name, label, extension):
+    """Имя превью повторяет путь оригинала вместе с расширением.
+
+    Имена оригиналов в хранилище уникальны, поэтому превью разных картинок
+    (например, a.png и a.jpg) не перезаписывают друг друга.
+    """
+    root, original_extension = os.path.splitext(image_name)
+    suffix = original_extension.lstrip('.')
+    return f'{VARIANTS_DIR}{root}_{suffix}_{label}.{extension}'
+
+
+def _save(storage, name, image, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    storage.delete(name)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def make_card(image, width=CARD_SIZE[0]):
+    """Кадрирует картинку по центру в пропорциях карточки поста."""
+    height = round(width * CARD_SIZE[1] / CARD_SIZE[0])
+    return ImageOps.fit(
+        image.convert('RGB'), (width, height), Image.LANCZOS,
+        centering=(0.5, 0.5)
+    )
+
+
+def available_formats():
+    """Форматы для srcset, которые поддерживает установленный Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in RESPONSIVE_FORMATS
+        if image_format[1] in Image.SAVE
+    ]
+
+
+def responsive_widths(image):
+    """Ширины из POST_IMAGE_WIDTHS без увеличения сверх оригинала."""
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    return [
+        width for width in widths
+        if width <= image.width or width == widths[0]
+    ]
+
+
+def generate_variants(post_id):
+    """Нарезает превью картинки поста и сохраняет пути к ним."""
+    post = Post.objects.filter(pk=post_id).only(
+        'image', 'author_id', 'group_id'
+    ).first()
+    if post is None or not post.image:
+        return {}
+    storage = post.image.storage
+    with post.image.open('rb') as image_file:
+        image = Image.open(image_file)
+        image.load()
+    variants = {
+        CARD: _save(
+            storage,
+            variant_name(post.image.name, '960x339', 'jpg'),
+            make_card(image),
+            'JPEG',
+            quality=85,
+        ),
+    }
+    widths = responsive_widths(image)
+    for label, image_format, extension, options in available_formats():
+        variants[label] = {
+            str(width): _save(
+                storage,
+                variant_name(post.image.name, f'{width}w', extension),
+                make_card(image, width),
+                image_format,
+                **options
+            )
+            for width in widths
+        }
+    Post.objects.filter(pk=post_id, image=post.image.name).update(
+        image_variants=json.dumps(variants)
+    )
+    caching.post_changed(post)
+    return variants
+
+
+def _generate(post_id):
+    with metrics.timer('thumbnail_time'):
+        return generate_variants(post_id)
+
+
+def _run(post_id):
+    try:
+        _generate(post_id)
+    except Exception:
+        logger.exception('Не удалось нарезать превью поста %s', post_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(post):
+    """Ставит нарезку превью в очередь после фиксации транзакции."""
+    if settings.THUMBNAIL_ASYNC:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run, post.pk)
+        )
+    else:
+        transaction.on_commit(lambda: _generate(post.pk))
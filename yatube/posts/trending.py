@@ -0,0 +1,85 @@
+"""Рейтинг популярных постов.
+
+Кандидаты — посты за последние TRENDING_WINDOW_DAYS дней. Оценка поста:
+
+    (1 + C * комментарии + F * новые подписчики автора) / (часы + 2) ** G
+
+где комментарии и подписки считаются за то же окно, C, F и G берутся из
+настроек. Пересчёт идёт командой compute_trending пачками по id: на
+пачку два агрегирующих запроса, оценки считаются сразу по столбцам пачки,
+строки рейтинга пачки заменяются в одной транзакции, так что читатели
+всегда видят полный рейтинг.
+"""
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import caching
+from .models import Comment, Follow, Post, TrendingScore
+
+
+def _totals(queryset, field):
+    return dict(
+        queryset.order_by().values(field).annotate(
+            total=Count('pk')
+        ).values_list(field, 'total')
+    )
+
+
+def scores(created, comments, follows, now):
+    """Оценки пачки по столбцам: даты, комментарии, подписки автора."""
+    ages = array('d', (
+        (now - moment).total_seconds() / 3600 for moment in created
+    ))
+    weights = array('d', (
+        1 + settings.TRENDING_COMMENT_WEIGHT * comment
+        + settings.TRENDING_FOLLOW_WEIGHT * follow
+        for comment, follow in zip(comments, follows)
+    ))
+    gravity = settings.TRENDING_GRAVITY
+    return array('d', (
+        weight / (max(age, 0) + 2) ** gravity
+        for weight, age in zip(weights, ages)
+    ))
+
+
+def compute(batch_size=1000, now=None):
+    """Пересчитывает рейтинг. Возвращает число оценённых постов."""
+    now = now or timezone.now()
+    since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+    follows = _totals(Follow.objects.filter(created__gte=since), 'author')
+    TrendingScore.objects.filter(post__created__lt=since).delete()
+    total, last_id = 0, 0
+    while True:
+        rows = list(
+            Post.objects.filter(created__gte=since, pk__gt=last_id)
+            .order_by('pk')
+            .values_list('pk', 'created', 'author_id')[:batch_size]
+        )
+        if not rows:
+            break
+        ids, created, authors = zip(*rows)
+        comments = _totals(
+            Comment.objects.filter(post_id__in=ids, created__gte=since),
+            'post'
+        )
+        batch = scores(
+            created,
+            [comments.get(pk, 0) for pk in ids],
+            [follows.get(author, 0) for author in authors],
+            now
+        )
+        with transaction.atomic():
+            TrendingScore.objects.filter(post_id__in=ids).delete()
+            TrendingScore.objects.bulk_create(
+                TrendingScore(post_id=pk, score=score)
+                for pk, score in zip(ids, batch)
+            )
+        total += len(ids)
+        last_id = ids[-1]
+    caching.touch(caching.TRENDING)
+    return total
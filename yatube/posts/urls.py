@@ -8,6 +8,7 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending, name='trending'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
@@ -18,6 +19,7 @@ urlpatterns = [
         views.add_comment, name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -28,6 +30,17 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'group/<slug:slug>/subscribe/',
+        views.group_subscribe,
+        name='group_subscribe'
+    ),
+    path(
+        'group/<slug:slug>/unsubscribe/',
+        views.group_unsubscribe,
+        name='group_unsubscribe'
+    ),
+    path('notifications/', views.notifications, name='notifications'),
 ]
 
 if settings.DEBUG:
@@ -1,11 +1,418 @@
+import base64
+import binascii
+import heapq
+import json
+from collections.abc import Sequence
+from itertools import islice
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import IntegerField, Q, Value
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
 NUMBER_OF_POSTS_DISPLAYED = settings.NUMBER_OF_POSTS_DISPLAYED
 
+COUNT_PREFIX = 'posts:count:'
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_token(values):
+    """Непрозрачный токен из списка значений, пригодных для JSON."""
+    raw = json.dumps(values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Разбирает токен. Для испорченного токена возвращает None."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def encode_cursor(obj, direction):
+    """Токен позиции в ленте: дата создания, id, направление.
+
+    Принимает объект модели или словарь из queryset.values().
+    """
+    if isinstance(obj, dict):
+        created, pk = obj['created'], obj['id']
+    else:
+        created, pk = obj.created, obj.pk
+    return encode_token([created.isoformat(), pk, direction])
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора. Для испорченного токена возвращает None."""
+    if not token:
+        return None
+    try:
+        created, pk, direction = decode_token(token)
+        created = parse_datetime(created)
+    except (ValueError, TypeError):
+        return None
+    if created is None or not isinstance(pk, int):
+        return None
+    if direction not in (FORWARD, BACKWARD):
+        return None
+    return created, pk, direction
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации, без номера и общего количества."""
+    is_cursor_page = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _sort_key(fields):
+    """Ключ сортировки для объектов модели и словарей из values()."""
+    names = [field.lstrip('-') for field in fields]
+
+    def key(obj):
+        if isinstance(obj, dict):
+            return tuple(obj['id' if name == 'pk' else name] for name in names)
+        return tuple(getattr(obj, name) for name in names)
+    return key
+
+
+def _unique(items):
+    """Элементы без повторов по первичному ключу."""
+    seen = set()
+    for item in items:
+        pk = item['id'] if isinstance(item, dict) else item.pk
+        if pk not in seen:
+            seen.add(pk)
+            yield item
+
+
+class MergedQuerySet:
+    """Несколько querysets с общей сортировкой как один список.
+
+    Умеет то, что нужно пагинаторам и API: filter, select_related, values,
+    order_by, count и срезы. Срез [a:b] берёт первые b строк каждой части
+    и сливает их по ключам сортировки, поэтому части могут перемежаться.
+    Часть, вернувшая все b строк, задаёт границу по первому ключу: строки
+    за ней в срез не попадут, и следующие части читаются только до неё.
+    Часть с собственной сортировкой (например, по индексу другой таблицы)
+    читается в своём порядке, он должен совпадать с общим. С unique части
+    могут пересекаться, повторы отбрасываются по первичному ключу.
+
+    Срез не с начала (глубокие страницы) так дорог: ключи его строк
+    выбирает UNION в базе, а сами строки читаются по первичным ключам.
+    """
+    ordered = True
+
+    def __init__(self, *querysets, ordering=('-created', '-pk'),
+                 unique=False):
+        self.querysets = querysets
+        self.ordering = ordering
+        self.unique = unique
+        self.counts = None
+
+    def _clone(self, method, *args, **kwargs):
+        return MergedQuerySet(
+            *(
+                getattr(queryset, method)(*args, **kwargs)
+                for queryset in self.querysets
+            ),
+            ordering=self.ordering, unique=self.unique
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._clone('filter', *args, **kwargs)
+
+    def select_related(self, *fields):
+        return self._clone('select_related', *fields)
+
+    def values(self, *fields, **expressions):
+        return self._clone('values', *fields, **expressions)
+
+    def order_by(self, *fields):
+        querysets = self.querysets
+        if fields != self.ordering:
+            # Собственный порядок частей годится только для прежней сортировки
+            querysets = [queryset.order_by() for queryset in querysets]
+        return MergedQuerySet(*querysets, ordering=fields, unique=self.unique)
+
+    def count(self):
+        if self.unique:
+            # Части пересекаются, строки без повторов считает UNION
+            first, *rest = (
+                queryset.order_by().values('pk')
+                for queryset in self.querysets
+            )
+            return first.union(*rest).count()
+        if self.counts is None:
+            self.counts = [queryset.count() for queryset in self.querysets]
+        return sum(self.counts)
+
+    def first(self):
+        items = self[:1]
+        return items[0] if items else None
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:None])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if index.start and index.stop is not None:
+            return self._slice_in_sql(index.start, index.stop)
+        key = _sort_key(self.ordering)
+        descending = self.ordering[0].startswith('-')
+        lookup = '{}__{}'.format(
+            self.ordering[0].lstrip('-'), 'gte' if descending else 'lte'
+        )
+        bound, parts = None, []
+        for number, queryset in enumerate(self.querysets):
+            # Части, про которые уже известно, что они пусты, не читаются
+            if self.counts is not None and not self.counts[number]:
+                continue
+            if bound is not None:
+                queryset = queryset.filter(**{lookup: bound})
+            if not queryset.query.order_by:
+                queryset = queryset.order_by(*self.ordering)
+            part = list(queryset[:index.stop])
+            parts.append(part)
+            if index.stop is not None and part and len(part) == index.stop:
+                edge = key(part[-1])[0]
+                if bound is None:
+                    bound = edge
+                else:
+                    bound = max(bound, edge) if descending else min(
+                        bound, edge
+                    )
+        merged = heapq.merge(*parts, key=key, reverse=descending)
+        if self.unique:
+            merged = _unique(merged)
+        return list(islice(merged, index.start or 0, index.stop))
+
+    def _slice_in_sql(self, start, stop):
+        fields = dict.fromkeys(
+            ['pk', *(field.lstrip('-') for field in self.ordering)]
+        )
+        first, *rest = (
+            queryset.order_by().annotate(
+                part=Value(number, IntegerField())
+            ).values('part', *fields)
+            if not self.unique else queryset.order_by().values(*fields)
+            for number, queryset in enumerate(self.querysets)
+        )
+        rows = list(
+            first.union(*rest, all=not self.unique).order_by(
+                *self.ordering
+            )[start:stop]
+        )
+        items = []
+        for number, queryset in enumerate(self.querysets):
+            pks = [
+                row['pk'] for row in rows
+                if self.unique or row['part'] == number
+            ]
+            if pks:
+                items.extend(queryset.order_by().filter(pk__in=pks))
+        items.sort(
+            key=_sort_key(self.ordering),
+            reverse=self.ordering[0].startswith('-')
+        )
+        if self.unique:
+            items = list(_unique(items))
+        return items
+
+
+def get_cursor_page(queryset, token, per_page=NUMBER_OF_POSTS_DISPLAYED):
+    """Страница по ключу (created, id) вместо LIMIT/OFFSET."""
+    cursor = decode_cursor(token)
+    if cursor is None:
+        items = list(queryset.order_by('-created', '-pk')[:per_page + 1])
+        has_more, items = len(items) > per_page, items[:per_page]
+        has_next, has_previous = has_more, False
+    else:
+        created, pk, direction = cursor
+        if direction == FORWARD:
+            items = list(
+                queryset.filter(
+                    Q(created__lt=created) | Q(created=created, pk__lt=pk)
+                ).order_by('-created', '-pk')[:per_page + 1]
+            )
+            has_more, items = len(items) > per_page, items[:per_page]
+            has_next, has_previous = has_more, True
+        else:
+            items = list(
+                queryset.filter(
+                    Q(created__gt=created) | Q(created=created, pk__gt=pk)
+                ).order_by('created', 'pk')[:per_page + 1]
+            )
+            has_more, items = len(items) > per_page, items[:per_page]
+            items.reverse()
+            has_next, has_previous = True, has_more
+    return CursorPage(
+        items,
+        next_cursor=(
+            encode_cursor(items[-1], FORWARD)
+            if has_next and items else None
+        ),
+        previous_cursor=(
+            encode_cursor(items[0], BACKWARD)
+            if has_previous and items else None
+        ),
+    )
+
+
+def get_cursor_paginator(queryset, request):
+    cursor = request.GET.get('cursor')
+    return {
+        'cursor': cursor,
+        'page_obj': get_cursor_page(queryset, cursor),
+    }
+
+
+class CachedCount:
+    """Количество записей списка из кэша.
+
+    Пока версия данных совпадает с сохранённой, количество точное. После
+    изменения данных прежнее значение отдаётся как приблизительное, пока
+    не истечёт PAGINATOR_COUNT_TTL, затем список пересчитывается. Без
+    версии количество всегда приблизительное.
+    """
+
+    def __init__(self, queryset, key, version=None):
+        self.queryset = queryset
+        self.key = COUNT_PREFIX + key
+        self.version = version
+        self.exact = False
+
+    def get(self):
+        entry = cache.get(self.key)
+        if entry is None:
+            return self.refresh()
+        version, count = entry
+        self.exact = self.version is not None and version == self.version
+        return count
+
+    def refresh(self):
+        count = self.queryset.count()
+        cache.set(
+            self.key, (self.version, count), settings.PAGINATOR_COUNT_TTL
+        )
+        self.exact = True
+        return count
+
+
+class WindowedPaginator(Paginator):
+    """Пагинатор с окном номеров страниц и готовым количеством записей.
+
+    total — число из денормализованного счётчика или CachedCount. Если
+    номер страницы выходит за приблизительное количество, оно уточняется.
+    Срез страницы не зависит от количества, поэтому устаревшее значение
+    не обрезает записи. С max_pages дальние страницы недоступны, номер
+    за ними приводится к последней доступной, а truncated отмечает, что
+    записи есть и дальше.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, total=None, max_pages=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.total = total
+        self.max_pages = max_pages
+        self.truncated = False
+
+    def _limit(self, count):
+        if self.max_pages is None:
+            return count
+        limit = self.max_pages * self.per_page
+        self.truncated = count > limit
+        return min(count, limit)
+
+    @cached_property
+    def count(self):
+        if self.total is None:
+            return self._limit(super().count)
+        if isinstance(self.total, CachedCount):
+            return self._limit(self.total.get())
+        return self._limit(self.total)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not isinstance(self.total, CachedCount) or self.total.exact:
+                raise
+            self.__dict__['count'] = self._limit(self.total.refresh())
+            self.__dict__.pop('num_pages', None)
+            return super().validate_number(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+def get_page_paginator(queryset, request, total=None, max_pages=None):
+    """Страница списка: курсорная или по номеру.
+
+    total и max_pages передаются в WindowedPaginator, курсорной странице
+    они не нужны.
+    """
+    if settings.CURSOR_PAGINATION or 'cursor' in request.GET:
+        return get_cursor_paginator(queryset, request)
+    return get_number_paginator(queryset, request, total, max_pages)
+
 
-def get_page_paginator(queryset, request):
-    paginator = Paginator(queryset, NUMBER_OF_POSTS_DISPLAYED)
+def get_number_paginator(queryset, request, total=None, max_pages=None):
+    """Страница по номеру, для списков не в порядке даты создания."""
+    paginator = WindowedPaginator(
+        queryset, NUMBER_OF_POSTS_DISPLAYED, total, max_pages
+    )
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return {
@@ -1,27 +1,88 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from core.sqlite import retry_locked
+
+from . import caching, thumbnails
+from .feed import get_feed
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
-from .utils import get_page_paginator
+from .models import (ArchivedComment, ArchivedPost, Comment, Counters,
+                     Follow, FollowSuggestion, Group, GroupSubscription,
+                     Post, User)
+from .search import search_page
+from .utils import (CachedCount, CursorPage, MergedQuerySet,
+                    get_cursor_paginator, get_number_paginator,
+                    get_page_paginator)
+
+
+def get_suggestions(user):
+    """Рекомендации подписок пользователя, один запрос по индексу."""
+    if not user.is_authenticated:
+        return []
+    return FollowSuggestion.objects.filter(user=user).select_related(
+        'author'
+    )[:settings.FOLLOW_SUGGESTIONS]
 
 
-@cache_page(20)
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all().select_related('group')
-    paginator = get_page_paginator(post_list, request)
-    return render(request, template, context=paginator)
+    post_list = Post.objects.select_related('author', 'group')
+    cache_version = caching.get_version(
+        caching.INDEX, caching.GROUPS, caching.AUTHORS
+    )
+    paginator = get_page_paginator(
+        post_list, request, CachedCount(post_list, 'index', cache_version)
+    )
+    context = {
+        'cache_version': cache_version,
+        **paginator
+    }
+    return render(request, template, context)
+
+
+def trending(request):
+    template = 'posts/trending.html'
+    post_list = Post.objects.filter(trending__isnull=False).select_related(
+        'author', 'group'
+    ).order_by('-trending__score', '-pk')
+    cache_version = caching.get_version(
+        caching.TRENDING, caching.INDEX, caching.GROUPS, caching.AUTHORS
+    )
+    # Рейтинг не упорядочен по дате, курсорная пагинация к нему не подходит
+    paginator = get_number_paginator(
+        post_list, request,
+        CachedCount(post_list, caching.TRENDING, cache_version)
+    )
+    context = {
+        'cache_version': cache_version,
+        **paginator
+    }
+    return render(request, template, context)
 
 
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    group_list = group.groups.all()
-    paginator = get_page_paginator(group_list, request)
+    group_list = group.groups.select_related('author')
+    cache_version = caching.get_version(
+        caching.group(group.pk), caching.GROUPS, caching.AUTHORS
+    )
+    paginator = get_page_paginator(
+        group_list, request,
+        CachedCount(group_list, caching.group(group.pk), cache_version)
+    )
+    subscribed = (
+        request.user.is_authenticated
+        and GroupSubscription.objects.filter(
+            user=request.user, group=group
+        ).exists()
+    )
     context = {
         'group': group,
+        'subscribed': subscribed,
+        'cache_version': cache_version,
         **paginator
     }
     return render(request, template, context)
@@ -29,10 +90,21 @@ def group_posts(request, slug):
 
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
     user = request.user
-    post_list = author.posts.all().select_related('author')
-    paginator = get_page_paginator(post_list, request)
+    # Версия читается до постов, см. posts.caching
+    cache_version = caching.get_version(
+        caching.profile(author.pk), caching.GROUPS, caching.AUTHORS
+    )
+    post_list = MergedQuerySet(
+        author.posts.select_related('author', 'group'),
+        author.archived_posts.select_related('author', 'group')
+    )
+    # Счётчик постов автора учитывает и архивные
+    total = author.counters.posts if hasattr(author, 'counters') else None
+    paginator = get_page_paginator(post_list, request, total)
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=user, author=author
@@ -43,6 +115,8 @@ def profile(request, username):
         'author': author,
         'user': user,
         'following': following,
+        'suggestions': get_suggestions(user),
+        'cache_version': cache_version,
         **paginator
     }
     return render(request, template, context)
@@ -50,20 +124,50 @@ def profile(request, username):
 
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    cache_version = caching.get_version(
+        caching.post(post_id), caching.GROUPS, caching.AUTHORS
+    )
+    post = Post.objects.select_related(
+        'author__counters', 'group'
+    ).filter(pk=post_id).first()
+    comment_model = Comment
+    if post is None:
+        post = get_object_or_404(
+            ArchivedPost.objects.select_related('author__counters', 'group'),
+            pk=post_id
+        )
+        comment_model = ArchivedComment
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post_id=post_id).select_related('post')
-    paginator = get_page_paginator(comments, request)
+    comments = comment_model.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = get_page_paginator(comments, request, post.comments_count)
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'cache_version': cache_version,
         **paginator
     }
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    if query:
+        page_obj = search_page(query, request.GET.get('cursor'))
+    else:
+        page_obj = CursorPage([])
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
+@retry_locked
 def post_create(request):
     template = 'posts/create_post.html'
     form = PostForm(request.POST or None, files=request.FILES or None,)
@@ -71,6 +175,8 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            thumbnails.schedule(post)
         return redirect('posts:profile', username=post.author)
     context = {
         'form': form
@@ -79,10 +185,11 @@ def post_create(request):
 
 
 @login_required
+@retry_locked
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.pk:
         return redirect('posts:post_detail', post_id)
     form = PostForm(
         request.POST or None,
@@ -93,7 +200,12 @@ def post_edit(request, post_id):
         post.text = form.cleaned_data['text']
         post.group = form.cleaned_data['group']
         post.author = request.user
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            post.image_variants = ''
         post.save()
+        if image_changed:
+            thumbnails.schedule(post)
         return redirect('posts:post_edit', post_id)
     context = {
         'is_edit': True,
@@ -104,6 +216,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@retry_locked
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -118,25 +231,77 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    list_of_posts = Post.objects.filter(author__following__user=request.user)
-    paginator = get_page_paginator(list_of_posts, request)
-    return render(request, template, context=paginator)
+    list_of_posts = get_feed(request.user).select_related('author', 'group')
+    # Страница по номеру читает все источники до неё, глубина ограничена
+    paginator = get_page_paginator(
+        list_of_posts, request,
+        CachedCount(list_of_posts, f'feed:{request.user.pk}'),
+        settings.FEED_MAX_PAGES
+    )
+    context = {
+        'suggestions': get_suggestions(request.user),
+        **paginator
+    }
+    return render(request, template, context)
 
 
 @login_required
+@retry_locked
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=user, author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    if user != author:
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=user, author=author)
+                FollowSuggestion.objects.filter(
+                    user=user, author=author
+                ).delete()
+        except IntegrityError:
+            pass
     return redirect('posts:profile', username)
 
 
 @login_required
+@retry_locked
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    is_follower = Follow.objects.filter(user=request.user, author=author)
-    if is_follower.exists():
-        is_follower.delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username)
+
+
+@login_required
+@retry_locked
+def group_subscribe(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    try:
+        with transaction.atomic():
+            GroupSubscription.objects.create(user=request.user, group=group)
+    except IntegrityError:
+        pass
+    return redirect('posts:group_list', slug)
+
+
+@login_required
+@retry_locked
+def group_unsubscribe(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    GroupSubscription.objects.filter(user=request.user, group=group).delete()
+    return redirect('posts:group_list', slug)
+
+
+@login_required
+@retry_locked
+def notifications(request):
+    """Уведомления пользователя, открытие страницы отмечает их прочитанными."""
+    template = 'posts/notifications.html'
+    user = request.user
+    paginator = get_cursor_paginator(
+        user.notifications.select_related('post', 'actor'), request
+    )
+    # Счётчик загружен вместе с пользователем, без непрочитанных не пишем
+    if hasattr(user, 'counters') and user.counters.notifications:
+        user.notifications.filter(unread=True).update(unread=False)
+        Counters.objects.filter(user=user).update(notifications=0)
+        user.counters.notifications = 0
+    return render(request, template, paginator)
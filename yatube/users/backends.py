@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+User = get_user_model()
+
+
+class CountersBackend(ModelBackend):
+    """Загружает пользователя сессии вместе со счётчиками одним запросом.
+
+    Число непрочитанных уведомлений в шапке берётся из Counters без
+    отдельного запроса на каждой странице.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related('counters').get(
+                pk=user_id
+            )
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -15,11 +15,25 @@ import os
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Версии из posts.caching и фрагменты, которые они защищают, должны быть
+# общими для всех воркеров, иначе запись в одном воркере не сбрасывает
+# фрагменты в остальных. При нескольких процессах общий кэш обязателен:
+# адрес memcached задаётся в CACHE_LOCATION. Без него кэш свой у каждого
+# процесса, и фрагменты живут не дольше FRAGMENT_CACHE_TIMEOUT секунд
+if os.getenv('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.InstrumentedMemcachedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION'),
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.InstrumentedLocMemCache',
+        }
+    }
+FRAGMENT_CACHE_TIMEOUT = 60
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -33,6 +47,65 @@ DEBUG = True
 # Количество постов выводимых на страницу
 NUMBER_OF_POSTS_DISPLAYED = 10
 
+# Рейтинг популярного: окно кандидатов в днях, вес комментария и новой
+# подписки на автора за окно, степень затухания оценки с возрастом в часах
+TRENDING_WINDOW_DAYS = 7
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_FOLLOW_WEIGHT = 0.5
+TRENDING_GRAVITY = 1.5
+
+# Рекомендации подписок: сколько хранить на пользователя и вес общей
+# группы относительно одной общей подписки
+FOLLOW_SUGGESTIONS = 5
+SUGGESTION_GROUP_WEIGHT = 0.5
+
+# Посты старше стольких дней команда archive_posts переносит в архив
+ARCHIVE_AFTER_DAYS = 365
+
+# Бэкенд полнотекстового поиска по постам. Для баз без FTS5
+# подойдёт posts.search.SimpleBackend
+SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+
+# Превью картинок постов нарезаются в фоновом пуле потоков. Тесты
+# выключают пул, чтобы нарезка не писала во временный MEDIA_ROOT после
+# его удаления
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+# Уведомления копятся в буфере процесса и записываются пачкой в фоновом
+# потоке: по NOTIFICATION_BATCH_SIZE событий или через
+# NOTIFICATION_FLUSH_SECONDS секунд после первого. Тесты, которым нужна
+# доставка сразу после фиксации транзакции, отключают NOTIFICATIONS_ASYNC
+NOTIFICATIONS_ASYNC = True
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_FLUSH_SECONDS = 2.0
+# Ширины превью для srcset, в пикселях
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+
+# Журнал медленных SQL-запросов с планами выполнения и его порог в мс
+SLOW_QUERY_LOG = False
+SLOW_QUERY_THRESHOLD = 100
+
+# Базовые замеры команды benchmark, с которыми сравниваются новые
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmark_baseline.json')
+
+# Курсорная пагинация по (created, id) вместо номеров страниц.
+# Для отдельного запроса включается параметром ?cursor=
+CURSOR_PAGINATION = False
+
+# Сколько секунд количество записей списка берётся из кэша, даже если
+# данные с тех пор изменились
+PAGINATOR_COUNT_TTL = 60
+
+# Посты авторов, у которых подписчиков больше этого порога, не рассылаются
+# по лентам при публикации, а подмешиваются в ленту при чтении
+FEED_FANOUT_LIMIT = 1000
+
+# Сколько последних постов автора добавляется в ленту при подписке
+FEED_BACKFILL_SIZE = 200
+
+# Сколько страниц ленты подписок доступно по номеру, дальше — по курсору
+FEED_MAX_PAGES = 10
+
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -41,6 +114,11 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
+# Адреса, с которых доступна страница метрик /metrics/ без входа
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
@@ -58,10 +136,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,7 +158,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -87,11 +168,15 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache.fragment_cache',
             ],
         },
     },
 ]
 
+# Разобрать все шаблоны при старте воркера, см. yatube/wsgi.py
+TEMPLATE_PRELOAD = False
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -102,13 +187,57 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами воркера, busy timeout 5 секунд
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 5},
     }
 }
 
+# Реплики только для чтения. Для проверки на одной машине в DB_REPLICAS
+# через запятую перечисляются файлы SQLite, копии основной базы
+# (см. команду sync_replicas). В тестах реплики подменяются основной базой
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 5},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Сколько секунд после записи чтения пользователя идут в основную базу
+REPLICA_PIN_SECONDS = 5
+
+# Прагмы каждого нового соединения SQLite: журнал WAL, fsync только на
+# контрольных точках, 64 МБ кэша страниц, 256 МБ отображения в память
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+# Повторы записи при блокировке базы и начальная пауза между ними, секунды
+SQLITE_WRITE_RETRIES = 3
+SQLITE_RETRY_DELAY = 0.05
+
+# Пользователь сессии загружается вместе со счётчиками, см. users.backends.
+# ModelBackend остаётся для сессий, открытых до CountersBackend
+AUTHENTICATION_BACKENDS = [
+    'users.backends.CountersBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
-
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
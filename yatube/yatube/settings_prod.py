@@ -0,0 +1,39 @@
+"""Настройки для продакшена.
+
+Запуск: DJANGO_SETTINGS_MODULE=yatube.settings_prod. Шаблоны читаются с
+диска один раз и хранятся разобранными в кэширующем загрузчике, а при
+старте воркера разбираются все сразу.
+
+Воркеров несколько, поэтому нужен общий кэш: memcached по адресу из
+CACHE_LOCATION (по умолчанию 127.0.0.1:11211) и пакет python-memcached.
+"""
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import TEMPLATES
+
+DEBUG = False
+
+THUMBNAIL_ASYNC = True
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.InstrumentedMemcachedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', '127.0.0.1:11211'),
+    }
+}
+# С общим кэшем фрагменты сбрасываются по версиям, срок жизни только
+# ограничивает память
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+TEMPLATE_PRELOAD = True
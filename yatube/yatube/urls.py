@@ -13,6 +13,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from core.views import metrics, slow_queries
 from django.contrib import admin
 from django.urls import path, include
 
@@ -22,6 +23,9 @@ urlpatterns = [
     path('auth/', include('django.contrib.auth.urls')),
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics/', metrics, name='metrics'),
+    path('metrics/slow-queries/', slow_queries, name='slow_queries'),
 ]
 
 handler404 = 'core.views.page_not_found'